@@ -0,0 +1,154 @@
+"""Structured JSON logging that never blocks the event loop.
+
+``configure_logging`` routes every log record through a bounded
+``QueueHandler``; a ``QueueListener`` thread does the actual formatting and
+stream I/O. ``AccessLogMiddleware`` emits one JSON access record per request,
+sampling successful fast requests and always logging errors and slow ones,
+and adds a ``Server-Timing`` header with the time spent per dependency.
+"""
+import hashlib
+import json
+import logging
+import queue
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import metrics
+from request_context import RequestContext, current_request
+
+LOG_RECORDS_DROPPED = metrics.counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full",
+)
+
+access_logger = logging.getLogger("thaparmart.access")
+
+# Dependencies reported in Server-Timing, in header order
+SERVER_TIMING_METRICS = ("db", "s3", "payment")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops (and counts) records instead of blocking when full"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def configure_logging(level: str = "INFO", queue_size: int = 10000) -> QueueListener:
+    """Send all logging through a background listener thread; returns the listener"""
+    log_queue = queue.Queue(maxsize=queue_size)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(level.upper())
+    return listener
+
+
+def hash_user_id(user_id: Optional[str]) -> Optional[str]:
+    if not user_id:
+        return None
+    return hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:16]
+
+
+def server_timing_header(context: RequestContext, total_seconds: float) -> str:
+    entries = [
+        f"{name};dur={context.timings[name] * 1000:.1f}"
+        for name in SERVER_TIMING_METRICS
+        if name in context.timings
+    ]
+    entries.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class AccessLogMiddleware:
+    """ASGI middleware that sets up the request context and logs each request"""
+
+    def __init__(self, app, sample_rate: float = 0.1, slow_ms: float = 1000.0, skip_paths=(), server_timing: bool = True):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.server_timing = server_timing
+        # Successful requests to these paths (e.g. health probes) are never logged
+        self.skip_paths = frozenset(skip_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        incoming_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming_id[:64] if incoming_id else uuid.uuid4().hex
+        context = RequestContext(request_id=request_id, method=scope["method"], path=scope["path"], scope=scope)
+        token = current_request.set(context)
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+                if self.server_timing:
+                    # Time up to the response headers; streamed bodies are not included
+                    timing = server_timing_header(context, time.perf_counter() - started)
+                    response_headers.append((b"server-timing", timing.encode("latin-1")))
+                message["headers"] = response_headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if not (status_code < 400 and scope["path"] in self.skip_paths):
+                self._log(context, status_code, duration_ms)
+            current_request.reset(token)
+
+    def _log(self, context: RequestContext, status_code: int, duration_ms: float):
+        slow = duration_ms >= self.slow_ms
+        if status_code < 400 and not slow and random.random() >= self.sample_rate:
+            return
+        level = logging.ERROR if status_code >= 500 else logging.WARNING if slow else logging.INFO
+        access_logger.log(level, "request", extra={"fields": {
+            "request_id": context.request_id,
+            "method": context.method,
+            "route": context.route_path() or "<unmatched>",
+            "status": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "db_ms": round(context.timings.get("db", 0.0) * 1000, 2),
+            "s3_ms": round(context.timings.get("s3", 0.0) * 1000, 2),
+            "payment_ms": round(context.timings.get("payment", 0.0) * 1000, 2),
+            "user": hash_user_id(context.user_id),
+            "slow": slow,
+            "sampled": status_code < 400 and not slow,
+        }})
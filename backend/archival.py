@@ -0,0 +1,133 @@
+"""Move long-sold products out of the hot ``products`` collection.
+
+``archive_sold_products`` copies products sold more than N days ago into
+``products_archive`` in batches and then removes them from ``products``, so
+the listing collection and its indexes only hold live and recently sold
+items. Each batch is an idempotent upsert followed by a delete, so a run that
+is interrupted part-way can simply be repeated.
+
+``ProductArchiver`` runs that job on an interval inside the API process. It
+can also be run once from cron::
+
+    python archival.py run [--days 90] [--batch-size 500] [--dry-run]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from pymongo import ReplaceOne
+
+import metrics
+
+ARCHIVE_COLLECTION = "products_archive"
+
+PRODUCTS_ARCHIVED = metrics.counter(
+    "products_archived_total",
+    "Sold products moved to the archive collection",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def archivable_query(cutoff: datetime) -> dict:
+    """Sold products whose sale (or, for products sold before sold_at existed, creation) is older than cutoff"""
+    return {
+        "is_sold": True,
+        "$or": [
+            {"sold_at": {"$lt": cutoff}},
+            {"sold_at": None, "created_at": {"$lt": cutoff}},
+        ],
+    }
+
+
+async def archive_sold_products(db, older_than: timedelta, batch_size: int = 500, dry_run: bool = False) -> int:
+    """Move matching products to the archive in batches; return how many were moved"""
+    cutoff = datetime.now(timezone.utc) - older_than
+    query = archivable_query(cutoff)
+    if dry_run:
+        return await db.products.count_documents(query)
+
+    archive = db[ARCHIVE_COLLECTION]
+    moved = 0
+    while True:
+        batch = await db.products.find(query, {"_id": 0}).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        archived_at = datetime.now(timezone.utc)
+        await archive.bulk_write(
+            [ReplaceOne({"id": product["id"]}, {**product, "archived_at": archived_at}, upsert=True) for product in batch],
+            ordered=False
+        )
+        result = await db.products.delete_many({"id": {"$in": [product["id"] for product in batch]}, "is_sold": True})
+        moved += result.deleted_count
+        PRODUCTS_ARCHIVED.inc(result.deleted_count)
+        if len(batch) < batch_size:
+            break
+    return moved
+
+
+class ProductArchiver:
+    def __init__(self, db, older_than_days: float, batch_size: int = 500, interval: float = 3600.0):
+        self.db = db
+        self.older_than = timedelta(days=older_than_days)
+        self.batch_size = batch_size
+        self.interval = interval
+        self._runner: Optional[asyncio.Task] = None
+
+    async def run_once(self) -> int:
+        moved = await archive_sold_products(self.db, self.older_than, self.batch_size)
+        if moved:
+            logger.info("Archived %d sold products", moved)
+        return moved
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Product archival failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._runner is None and self.interval > 0:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+
+async def run(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    mongo = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = mongo[os.environ['DB_NAME']]
+    try:
+        count = await archive_sold_products(db, timedelta(days=args.days), args.batch_size, dry_run=args.dry_run)
+        print(f"{'Would archive' if args.dry_run else 'Archived'} {count} products sold more than {args.days:g} days ago")
+    finally:
+        mongo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive long-sold products")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    run_parser = subcommands.add_parser("run", help="Move old sold products to the archive collection")
+    run_parser.add_argument("--days", type=float, default=90, help="Archive products sold more than this many days ago")
+    run_parser.add_argument("--batch-size", type=int, default=500, help="Products moved per bulk write")
+    run_parser.add_argument("--dry-run", action="store_true", help="Only count the products that would be archived")
+    args = parser.parse_args()
+    if args.command == "run":
+        asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
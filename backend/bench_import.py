@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the API module.
+Run with: python bench_import.py [--runs 10] [--top 15]
+
+Each run imports ``server`` in a fresh interpreter with ``-X importtime`` and
+no secrets in the environment, then reports the median wall time and the
+slowest imports (cumulative microseconds) from the median run.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent
+# Keep secrets out so the benchmark also proves the module imports without them
+SCRUBBED_PREFIXES = ("MONGO_", "DB_NAME", "AWS_", "S3_", "RAZORPAY_")
+
+
+def clean_env():
+    env = {key: value for key, value in os.environ.items() if not key.startswith(SCRUBBED_PREFIXES)}
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def run_once():
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"],
+        cwd=BACKEND_DIR, env=clean_env(), capture_output=True, text=True
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        sys.exit(result.returncode)
+    return elapsed, result.stderr
+
+
+def slowest_imports(importtime_output, top):
+    """Parse ``-X importtime`` lines into (cumulative_us, module) pairs"""
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long `import server` takes")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    runs = [run_once() for _ in range(args.runs)]
+    timings = sorted(elapsed for elapsed, _ in runs)
+    median = statistics.median(timings)
+    print(f"import server: median {median * 1000:.1f} ms, "
+          f"min {timings[0] * 1000:.1f} ms, max {timings[-1] * 1000:.1f} ms over {args.runs} runs")
+
+    _, median_output = min(runs, key=lambda run: abs(run[0] - median))
+    slowest = slowest_imports(median_output, args.top)
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, name in slowest:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""pymongo monitoring: DB time per request, slow commands and connection pool status."""
+import logging
+import threading
+from typing import Any, Optional
+
+from pymongo import monitoring
+
+import metrics
+from request_context import RequestContext, get_request_context
+
+SLOW_COMMANDS = metrics.counter(
+    "mongo_slow_commands_total",
+    "Mongo commands slower than the slow-command threshold",
+)
+
+slow_command_logger = logging.getLogger("thaparmart.mongo")
+
+# Where each command keeps the filter it runs
+_FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+
+
+def redact(value: Any) -> Any:
+    """The shape of a filter: field names and operators kept, values replaced by "?" """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [redact(item) for item in value]
+    return "?"
+
+
+def command_filter(command_name: str, command: dict) -> Optional[dict]:
+    if command_name in _FILTER_FIELDS:
+        return command.get(_FILTER_FIELDS[command_name])
+    if command_name in ("update", "delete"):
+        statements = command.get(command_name + "s") or []
+        return statements[0].get("q") if statements else None
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        if pipeline and "$match" in pipeline[0]:
+            return pipeline[0]["$match"]
+    return None
+
+
+def command_namespace(event: monitoring.CommandStartedEvent) -> str:
+    collection = event.command.get(event.command_name)
+    if isinstance(collection, str):
+        return f"{event.database_name}.{collection}"
+    return event.database_name
+
+
+class DbTimingListener(monitoring.CommandListener):
+    """Attributes command time to the current request and logs slow commands.
+
+    The command document is only available on the started event, so it is
+    kept until the command finishes; the redacted shape is only built for
+    commands over ``slow_ms``.
+    """
+
+    def __init__(self, slow_ms: float = 100.0):
+        self.slow_ms = slow_ms
+        self._started = {}
+
+    def started(self, event):
+        self._started[(event.connection_id, event.request_id)] = (event, get_request_context())
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+    def _finished(self, event):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        started_event, context = started
+        seconds = event.duration_micros / 1_000_000
+        if context is not None:
+            context.add_timing("db", seconds)
+        if seconds * 1000 >= self.slow_ms:
+            self._log_slow(started_event, context, seconds, isinstance(event, monitoring.CommandFailedEvent))
+
+    def _log_slow(self, event, context: Optional[RequestContext], seconds: float, failed: bool):
+        SLOW_COMMANDS.inc()
+        command_filter_value = command_filter(event.command_name, event.command)
+        sort = event.command.get("sort")
+        slow_command_logger.warning("slow mongo command", extra={"fields": {
+            "command": event.command_name,
+            "namespace": command_namespace(event),
+            "duration_ms": round(seconds * 1000, 2),
+            "filter": redact(command_filter_value) if command_filter_value is not None else None,
+            "sort": dict(sort) if sort else None,
+            "failed": failed,
+            "request_id": context.request_id if context else None,
+            "route": (context.route_path() or "<unmatched>") if context else None,
+        }})
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Tracks open and checked-out connections across all pools of a client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.checkout_failures = 0
+
+    def _adjust(self, attribute: str, delta: int):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + delta)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "checkout_failures": self.checkout_failures,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._adjust("open", 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._adjust("open", -1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._adjust("checkout_failures", 1)
+
+    def connection_checked_out(self, event):
+        self._adjust("checked_out", 1)
+
+    def connection_checked_in(self, event):
+        self._adjust("checked_out", -1)
@@ -0,0 +1,143 @@
+"""Broadcast hub for live product events streamed over Server-Sent Events.
+
+Each SSE connection subscribes with an optional category filter and gets a
+small bounded buffer. A subscriber whose buffer fills up (a slow client) is
+dropped rather than letting events pile up in memory.
+
+With ``fanout="local"`` events are delivered only to subscribers in this
+worker. With ``fanout="change_stream"`` they are written to a small events
+collection, and every worker delivers them from a change stream on that
+collection, so all workers' subscribers see every event.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+
+import metrics
+
+SUBSCRIBERS = metrics.gauge(
+    "product_event_subscribers",
+    "Open product event stream subscriptions",
+)
+EVENTS_PUBLISHED = metrics.counter(
+    "product_events_published_total",
+    "Product events published by type",
+)
+SUBSCRIBERS_DROPPED = metrics.counter(
+    "product_event_subscribers_dropped_total",
+    "Subscribers dropped because their buffer was full",
+)
+
+logger = logging.getLogger(__name__)
+
+# How long event documents are kept for change-stream fan-out
+EVENT_RETENTION = timedelta(minutes=10)
+
+
+class Subscriber:
+    def __init__(self, category: Optional[str], buffer_size: int):
+        self.category = category
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        self.dropped = False
+
+    def wants(self, event: dict) -> bool:
+        return self.category is None or event.get("category") in (None, self.category)
+
+
+class ProductEventHub:
+    def __init__(self, collection=None, fanout: str = "local", buffer_size: int = 100):
+        self.collection = collection
+        self.fanout = fanout
+        self.buffer_size = buffer_size
+        self._subscribers: Set[Subscriber] = set()
+        self._watcher: Optional[asyncio.Task] = None
+
+    def subscribe(self, category: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(category, self.buffer_size)
+        self._subscribers.add(subscriber)
+        SUBSCRIBERS.set(len(self._subscribers))
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        SUBSCRIBERS.set(len(self._subscribers))
+
+    async def publish(self, event: dict):
+        EVENTS_PUBLISHED.inc(type=event["type"])
+        if self.fanout == "change_stream":
+            await self.collection.insert_one({
+                "event": event,
+                "expires_at": datetime.now(timezone.utc) + EVENT_RETENTION
+            })
+        else:
+            self._deliver(event)
+
+    def _deliver(self, event: dict):
+        for subscriber in list(self._subscribers):
+            if subscriber.dropped or not subscriber.wants(event):
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        """Discard a slow subscriber's backlog and signal its stream to close"""
+        subscriber.dropped = True
+        SUBSCRIBERS_DROPPED.inc()
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+        self.unsubscribe(subscriber)
+
+    async def start(self):
+        if self.fanout != "change_stream" or self._watcher is not None:
+            return
+        await self.collection.create_index("expires_at", expireAfterSeconds=0, name="product_event_ttl")
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        resume_token = None
+        backoff = 1.0
+        while True:
+            try:
+                async with self.collection.watch(
+                    [{"$match": {"operationType": "insert"}}],
+                    resume_after=resume_token
+                ) as stream:
+                    backoff = 1.0
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self._deliver(change["fullDocument"]["event"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Product event change stream interrupted: %s", e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        for subscriber in list(self._subscribers):
+            if subscriber.queue.full():
+                self._drop(subscriber)
+            else:
+                subscriber.queue.put_nowait(None)
+        self._subscribers.clear()
+        SUBSCRIBERS.set(0)
+
+
+def product_event(event_type: str, product: dict) -> dict:
+    """Compact event payload for a product change"""
+    event = {"type": event_type, "id": product["id"], "category": product.get("category")}
+    if event_type == "created":
+        event.update({
+            "title": product["title"],
+            "price": product["price"],
+            "seller_id": product["seller_id"],
+        })
+    return event
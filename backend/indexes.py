@@ -0,0 +1,64 @@
+"""Index definitions for the collections the API queries.
+
+Key order follows equality, sort, range: every category/price/sort
+combination in the listing feed is answered from an index without an
+in-memory sort, and price-descending reuses the ascending index in reverse.
+``tests/test_query_plans.py`` checks the hot queries in ``queries.py``
+against exactly these definitions.
+"""
+from typing import Dict, List
+
+from pymongo import IndexModel
+
+from archival import ARCHIVE_COLLECTION
+from product_feed import FEED_COLLECTION, FEED_INDEXES
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    FEED_COLLECTION: FEED_INDEXES,
+    "products": [
+        IndexModel(
+            [("is_sold", 1), ("created_at", -1), ("id", -1), ("price", 1)],
+            name="listing_newest"
+        ),
+        IndexModel(
+            [("seller_id", 1), ("created_at", -1), ("id", -1)],
+            name="seller_newest"
+        ),
+        IndexModel(
+            [("seller_id", 1), ("is_sold", 1)],
+            name="seller_sold_state"
+        ),
+        IndexModel(
+            [("is_sold", 1), ("sold_at", 1)],
+            name="archive_candidates"
+        ),
+    ],
+    ARCHIVE_COLLECTION: [
+        IndexModel([("id", 1)], name="archive_product_id", unique=True),
+        IndexModel(
+            [("seller_id", 1), ("created_at", -1), ("id", -1)],
+            name="archive_seller_newest"
+        ),
+    ],
+    "users": [
+        IndexModel([("id", 1)], name="user_id"),
+    ],
+    "sessions": [
+        IndexModel([("session_token", 1)], name="session_token", unique=True),
+        # Expired sessions can never authenticate; let Mongo remove them
+        IndexModel([("expires_at", 1)], name="session_ttl", expireAfterSeconds=0),
+    ],
+    "payment_tokens": [
+        # Upload-token checks: equality on user and status, range/sort on expiry
+        IndexModel(
+            [("user_id", 1), ("status", 1), ("expires_at", 1)],
+            name="payment_user_status_expiry"
+        ),
+        IndexModel([("order_id", 1)], name="payment_order"),
+    ],
+}
+
+
+async def create_indexes(db):
+    for collection, models in INDEXES.items():
+        await db[collection].create_indexes(models)
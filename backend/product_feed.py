@@ -0,0 +1,158 @@
+"""Materialized listing feed: one small document per unsold product.
+
+``product_feed`` holds exactly the fields the listing endpoint returns, for
+unsold products only, indexed for every category/price/sort combination. The
+API keeps it in step on every write that changes what the listing shows
+(create, sold, delete, seller profile changes). Run as a script to rebuild it
+from ``products`` or to check the two for drift::
+
+    python product_feed.py rebuild
+    python product_feed.py check [--repair]
+"""
+import argparse
+import asyncio
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+import pymongo
+from pymongo import DeleteOne, ReplaceOne
+
+FEED_COLLECTION = "product_feed"
+
+# Product fields shown by the listing. is_sold is implied (always False).
+FEED_FIELDS = (
+    "id", "title", "description", "price", "category", "images",
+    "seller_id", "seller_name", "seller_email", "seller_phone", "created_at",
+)
+FEED_PROJECTION = {"_id": 0, **{name: 1 for name in FEED_FIELDS}}
+
+# User fields copied onto each of the seller's listings
+SELLER_FIELDS = {"name": "seller_name", "email": "seller_email", "phone": "seller_phone"}
+
+FEED_INDEXES = [
+    pymongo.IndexModel([("created_at", -1), ("id", -1), ("price", 1)], name="feed_newest"),
+    pymongo.IndexModel([("category", 1), ("created_at", -1), ("id", -1), ("price", 1)], name="feed_category_newest"),
+    pymongo.IndexModel([("price", 1), ("id", 1)], name="feed_price"),
+    pymongo.IndexModel([("category", 1), ("price", 1), ("id", 1)], name="feed_category_price"),
+    pymongo.IndexModel([("id", 1)], name="feed_product_id", unique=True),
+    pymongo.IndexModel([("seller_id", 1)], name="feed_seller"),
+]
+
+
+def feed_document(product: dict) -> dict:
+    return {name: product[name] for name in FEED_FIELDS if name in product}
+
+
+async def add_to_feed(db, products: List[dict]):
+    if products:
+        await db[FEED_COLLECTION].bulk_write(
+            [ReplaceOne({"id": product["id"]}, feed_document(product), upsert=True) for product in products],
+            ordered=False
+        )
+
+
+async def remove_from_feed(db, product_ids: List[str]):
+    if product_ids:
+        await db[FEED_COLLECTION].delete_many({"id": {"$in": list(product_ids)}})
+
+
+async def sync_seller_fields(db, seller_id: str, user_fields: dict):
+    """Copy changed seller details onto the seller's products and feed entries"""
+    update = {SELLER_FIELDS[name]: value for name, value in user_fields.items() if name in SELLER_FIELDS}
+    if update:
+        await db.products.update_many({"seller_id": seller_id}, {"$set": update})
+        await db[FEED_COLLECTION].update_many({"seller_id": seller_id}, {"$set": update})
+
+
+async def rebuild_feed(db):
+    """Rebuild the feed from products into a scratch collection, then swap it in.
+
+    Writes that land between the aggregation snapshot and the rename can be
+    missed; ``check_feed(repair=True)`` picks them up.
+    """
+    scratch = f"{FEED_COLLECTION}_rebuild_{uuid.uuid4().hex[:8]}"
+    await db.products.aggregate([
+        {"$match": {"is_sold": False}},
+        {"$project": FEED_PROJECTION},
+        {"$out": scratch},
+    ]).to_list(length=None)
+    await db[scratch].create_indexes(FEED_INDEXES)
+    await db[scratch].rename(FEED_COLLECTION, dropTarget=True)
+    return await db[FEED_COLLECTION].count_documents({})
+
+
+async def feed_needs_build(db) -> bool:
+    """True for a deployment that has unsold products but no feed yet"""
+    if await db[FEED_COLLECTION].find_one({}, {"_id": 1}):
+        return False
+    return await db.products.find_one({"is_sold": False}, {"_id": 1}) is not None
+
+
+async def _by_id(cursor) -> Dict[str, dict]:
+    return {document["id"]: document async for document in cursor}
+
+
+async def check_feed(db, repair: bool = False) -> Dict[str, List[str]]:
+    """Compare the feed with unsold products; return missing, stale and extra IDs"""
+    expected = await _by_id(db.products.find({"is_sold": False}, FEED_PROJECTION))
+    actual = await _by_id(db[FEED_COLLECTION].find({}, FEED_PROJECTION))
+
+    report = {
+        "missing": [product_id for product_id in expected if product_id not in actual],
+        "stale": [product_id for product_id in expected if product_id in actual and actual[product_id] != expected[product_id]],
+        "extra": [product_id for product_id in actual if product_id not in expected],
+    }
+    if repair:
+        operations = [
+            ReplaceOne({"id": product_id}, expected[product_id], upsert=True)
+            for product_id in report["missing"] + report["stale"]
+        ] + [DeleteOne({"id": product_id}) for product_id in report["extra"]]
+        if operations:
+            await db[FEED_COLLECTION].bulk_write(operations, ordered=False)
+    return report
+
+
+def _print_ids(label: str, ids: Iterable[str]):
+    ids = list(ids)
+    print(f"{label}: {len(ids)}")
+    for product_id in ids[:20]:
+        print(f"  {product_id}")
+    if len(ids) > 20:
+        print(f"  ... and {len(ids) - 20} more")
+
+
+async def run(args):
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    mongo = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = mongo[os.environ['DB_NAME']]
+    try:
+        if args.command == "rebuild":
+            count = await rebuild_feed(db)
+            print(f"Rebuilt {FEED_COLLECTION} with {count} listings")
+        elif args.command == "check":
+            report = await check_feed(db, repair=args.repair)
+            for label, ids in report.items():
+                _print_ids(label.capitalize(), ids)
+            if args.repair:
+                print(f"Repaired {sum(len(ids) for ids in report.values())} entries")
+    finally:
+        mongo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the materialized product listing feed")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    subcommands.add_parser("rebuild", help="Rebuild the feed from the products collection")
+    check_parser = subcommands.add_parser("check", help="Report listings missing from, stale in or extra in the feed")
+    check_parser.add_argument("--repair", action="store_true", help="Fix the differences that were found")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Filters and sort orders for the hot read paths.
+
+The API builds these queries here and ``tests/test_query_plans.py`` explains
+the same shapes against the indexes in ``indexes.py``, so a query or index
+change that loses index support fails the tests instead of slowing
+production down.
+"""
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import pymongo
+
+# Sort options for the product listing: (sort field, direction). Ties are
+# broken on "id" in the same direction so keyset pagination stays stable.
+PRODUCT_SORTS = {
+    "newest": ("created_at", pymongo.DESCENDING),
+    "price_asc": ("price", pymongo.ASCENDING),
+    "price_desc": ("price", pymongo.DESCENDING),
+}
+
+# A seller's products, newest first ("id" breaks ties for keyset cursors)
+SELLER_PRODUCTS_SORT = [("created_at", pymongo.DESCENDING), ("id", pymongo.DESCENDING)]
+
+
+def session_filter(session_token: str, now: datetime) -> dict:
+    return {"session_token": session_token, "expires_at": {"$gt": now}}
+
+
+def product_listing(
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: str = "newest",
+    last_position: Optional[tuple] = None,
+) -> Tuple[dict, List[tuple]]:
+    """Filter and sort for one page of the listing feed"""
+    query = {}
+    if category:
+        query["category"] = category
+
+    price_range = {}
+    if min_price is not None:
+        price_range["$gte"] = min_price
+    if max_price is not None:
+        price_range["$lte"] = max_price
+    if price_range:
+        query["price"] = price_range
+
+    sort_field, direction = PRODUCT_SORTS[sort]
+    if last_position:
+        last_value, last_id = last_position
+        op = "$lt" if direction == pymongo.DESCENDING else "$gt"
+        query["$or"] = [
+            {sort_field: {op: last_value}},
+            {sort_field: last_value, "id": {op: last_id}}
+        ]
+    return query, [(sort_field, direction), ("id", direction)]
+
+
+def paid_tokens_filter(user_id: str, now: datetime) -> dict:
+    """A user's paid, unexpired upload tokens"""
+    return {"user_id": user_id, "status": "paid", "expires_at": {"$gt": now}}
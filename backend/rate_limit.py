@@ -0,0 +1,321 @@
+"""Token-bucket rate limiting for unauthenticated endpoints.
+
+Policies are attached to ``(method, path)`` routes and keyed either on the
+client IP or on a field of the request body (for example the email prefix
+being checked). Bucket state lives in a pluggable backend: the default
+``ShardedMemoryBackend`` keeps compact per-process counters, while
+``MongoRateLimitBackend`` shares them across workers.
+"""
+import ipaddress
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from hashlib import blake2b
+from typing import Dict, List, Optional, Tuple
+
+from starlette.requests import Request
+
+import metrics
+
+RATE_LIMIT_DECISIONS = metrics.counter(
+    "rate_limit_decisions_total",
+    "Rate limiter decisions by route, policy and outcome",
+)
+
+# Bodies larger than this are never buffered to extract a key field
+MAX_KEY_BODY_BYTES = 64 * 1024
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    rate: float  # tokens refilled per second
+    burst: int  # bucket capacity
+    key: str = "ip"  # "ip" or the name of a body field
+
+    @property
+    def uses_body(self) -> bool:
+        return self.key != "ip"
+
+
+def _per_minute(count: int) -> float:
+    return count / 60.0
+
+
+DEFAULT_POLICIES: Dict[Tuple[str, str], List[RateLimitPolicy]] = {
+    ("POST", "/api/auth/check-user"): [
+        RateLimitPolicy("check_user_ip", _per_minute(30), 10),
+        RateLimitPolicy("check_user_key", _per_minute(10), 5, key="thapar_email_prefix"),
+    ],
+    ("POST", "/api/auth/register"): [
+        RateLimitPolicy("register_ip", _per_minute(5), 5),
+        RateLimitPolicy("register_key", _per_minute(2), 3, key="thapar_email_prefix"),
+    ],
+    ("POST", "/api/auth/session"): [
+        RateLimitPolicy("session_ip", _per_minute(20), 10),
+        RateLimitPolicy("session_key", _per_minute(5), 3, key="session_id"),
+    ],
+}
+
+
+def load_policies(raw: Optional[str]) -> Dict[Tuple[str, str], List[RateLimitPolicy]]:
+    """Build the route policy table, applying overrides from a JSON string.
+
+    The JSON maps ``"METHOD /path"`` to a list of
+    ``{"name", "per_minute", "burst", "key"}`` objects; an empty list disables
+    limiting for that route. Raises RuntimeError for a rule that could never
+    admit a request (``per_minute`` or ``burst`` not positive).
+    """
+    policies = dict(DEFAULT_POLICIES)
+    if not raw:
+        return policies
+    for route, rules in json.loads(raw).items():
+        method, path = route.split(" ", 1)
+        for rule in rules:
+            for field in ("per_minute", "burst"):
+                if rule[field] <= 0:
+                    raise RuntimeError(
+                        f"RATE_LIMITS rule {rule['name']!r} for {route!r} needs a positive {field}, not {rule[field]!r}"
+                    )
+        policies[(method.upper(), path)] = [
+            RateLimitPolicy(
+                name=rule["name"],
+                rate=_per_minute(rule["per_minute"]),
+                burst=int(rule["burst"]),
+                key=rule.get("key", "ip"),
+            )
+            for rule in rules
+        ]
+    return policies
+
+
+def _bucket_id(key: str) -> int:
+    """Hash a bucket key down to a 64-bit integer to keep entries small"""
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ShardedMemoryBackend:
+    """Per-process token buckets split across LRU-bounded shards.
+
+    Each entry is an ``int -> (tokens, timestamp)`` pair, and every shard
+    evicts its least recently used bucket once it reaches ``max_keys_per_shard``.
+    An evicted bucket simply starts full again.
+    """
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 4096):
+        self._shards = [OrderedDict() for _ in range(shards)]
+        self._max_keys_per_shard = max_keys_per_shard
+
+    async def setup(self):
+        pass
+
+    async def consume(self, key: str, rate: float, burst: int, cost: float = 1.0) -> Tuple[bool, float]:
+        bucket_id = _bucket_id(key)
+        shard = self._shards[bucket_id % len(self._shards)]
+        now = time.monotonic()
+
+        state = shard.pop(bucket_id, None)
+        if state is None:
+            tokens = float(burst)
+        else:
+            tokens = min(float(burst), state[0] + (now - state[1]) * rate)
+
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        shard[bucket_id] = (tokens, now)
+        if len(shard) > self._max_keys_per_shard:
+            shard.popitem(last=False)
+
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class MongoRateLimitBackend:
+    """Token buckets stored in a Mongo collection and shared by all workers.
+
+    Each decision is a single atomic ``find_one_and_update`` with an
+    aggregation-pipeline update; idle buckets expire through a TTL index.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    async def setup(self):
+        await self._collection.create_index("expires_at", expireAfterSeconds=0, name="rate_limit_ttl")
+
+    async def consume(self, key: str, rate: float, burst: int, cost: float = 1.0) -> Tuple[bool, float]:
+        now = time.time()
+        refill_seconds = burst / rate if rate else 3600
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=refill_seconds)
+        state = await self._collection.find_one_and_update(
+            {"_id": f"{_bucket_id(key):016x}"},
+            [
+                {"$set": {
+                    "tokens": {"$min": [
+                        float(burst),
+                        {"$add": [
+                            {"$ifNull": ["$tokens", float(burst)]},
+                            {"$multiply": [{"$subtract": [now, {"$ifNull": ["$ts", now]}]}, rate]},
+                        ]},
+                    ]},
+                    "ts": now,
+                }},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {
+                    "tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]},
+                    "expires_at": expires_at,
+                }},
+            ],
+            upsert=True,
+            return_document=True,
+        )
+        if state["allowed"]:
+            return True, 0.0
+        return False, (cost - state["tokens"]) / rate
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying token-bucket policies to matching routes"""
+
+    def __init__(self, app, policies, backend, trust_proxy: bool = False, trusted_proxies=()):
+        self.app = app
+        self.policies = policies
+        # Either a backend or a zero-argument callable returning one, for
+        # backends that are only created when the app starts up
+        self._backend = backend
+        self.trust_proxy = trust_proxy
+        # Forwarding headers are only believed from these peers (any peer if empty)
+        self.trusted_proxies = [ipaddress.ip_network(network, strict=False) for network in trusted_proxies]
+
+    @property
+    def backend(self):
+        return self._backend() if callable(self._backend) else self._backend
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = (scope["method"], scope["path"])
+        rules = self.policies.get(route)
+        if not rules:
+            await self.app(scope, receive, send)
+            return
+
+        fields = {}
+        if any(rule.uses_body for rule in rules):
+            receive, fields = await self._read_key_fields(scope, receive, rules)
+
+        route_label = f"{route[0]} {route[1]}"
+        for rule in rules:
+            subject = self._client_ip(scope) if rule.key == "ip" else fields.get(rule.key)
+            if not subject:
+                # Missing key fields are left for the endpoint to reject
+                continue
+            allowed, retry_after = await self.backend.consume(
+                f"{rule.name}:{subject}", rule.rate, rule.burst
+            )
+            RATE_LIMIT_DECISIONS.inc(
+                route=route_label, policy=rule.name, decision="allowed" if allowed else "throttled"
+            )
+            if not allowed:
+                await self._reject(send, retry_after)
+                return
+
+        await self.app(scope, receive, send)
+
+    def _trusted_peer(self, peer: Optional[str]) -> bool:
+        if not self.trusted_proxies:
+            return True
+        try:
+            address = ipaddress.ip_address(peer)
+        except (TypeError, ValueError):
+            return False
+        return any(address in network for network in self.trusted_proxies)
+
+    def _client_ip(self, scope) -> str:
+        client = scope.get("client")
+        peer = client[0] if client else None
+        if self.trust_proxy and self._trusted_peer(peer):
+            headers = dict(scope.get("headers") or [])
+            real_ip = headers.get(b"x-real-ip")
+            if real_ip:
+                return real_ip.decode("latin-1")
+            forwarded = headers.get(b"x-forwarded-for")
+            if forwarded:
+                # The proxy appends the address it saw; earlier entries are client-supplied
+                return forwarded.decode("latin-1").split(",")[-1].strip()
+        return peer or "unknown"
+
+    async def _read_key_fields(self, scope, receive, rules):
+        """Buffer a small request body, extract key fields and replay it"""
+        headers = dict(scope.get("headers") or [])
+        # A missing, malformed or large Content-Length skips the body-keyed policies
+        try:
+            content_length = int(headers[b"content-length"])
+        except (KeyError, ValueError):
+            return receive, {}
+        if content_length > MAX_KEY_BODY_BYTES:
+            return receive, {}
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return receive, {}
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        wanted = {rule.key for rule in rules if rule.uses_body}
+        fields = {}
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        try:
+            if content_type.startswith("application/json"):
+                data = json.loads(body or b"{}")
+            else:
+                parse_done = False
+
+                async def parse_receive():
+                    nonlocal parse_done
+                    if not parse_done:
+                        parse_done = True
+                        return {"type": "http.request", "body": body, "more_body": False}
+                    return {"type": "http.disconnect"}
+
+                data = await Request(scope, parse_receive).form()
+            for name in wanted:
+                value = data.get(name) if hasattr(data, "get") else None
+                if isinstance(value, str) and value.strip():
+                    fields[name] = value.strip().lower()
+        except Exception:
+            fields = {}
+
+        return replay, fields
+
+    async def _reject(self, send, retry_after: float):
+        retry_seconds = max(1, math.ceil(retry_after))
+        body = json.dumps({"detail": "Too many requests. Please try again later."}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(retry_seconds).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,60 @@
+"""Per-request context shared by middleware, dependencies and DB monitoring.
+
+The context object is mutable and stored in a ``ContextVar``. Code that runs
+in a copied context still updates the same request: this includes Motor's
+executor threads, where pymongo command listeners fire.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass
+class RequestContext:
+    request_id: str
+    method: str
+    path: str
+    route: Optional[str] = None
+    user_id: Optional[str] = None
+    # The ASGI scope; routing adds the matched route to it
+    scope: dict = field(default_factory=dict, repr=False)
+    # Seconds spent per dependency ("db", "s3", ...), accumulated across calls
+    timings: Dict[str, float] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_timing(self, name: str, seconds: float):
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def route_path(self) -> Optional[str]:
+        """The matched route template, once routing has happened"""
+        if self.route is None:
+            self.route = getattr(self.scope.get("route"), "path", None)
+        return self.route
+
+
+current_request: ContextVar[Optional[RequestContext]] = ContextVar("current_request", default=None)
+
+
+def get_request_context() -> Optional[RequestContext]:
+    return current_request.get()
+
+
+def add_timing(name: str, seconds: float):
+    """Attribute time to the current request, if there is one"""
+    context = current_request.get()
+    if context is not None:
+        context.add_timing(name, seconds)
+
+
+@contextmanager
+def timed(name: str):
+    """Attribute the wall time of the block to the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - started)
@@ -0,0 +1,213 @@
+"""Background removal of product images from S3.
+
+``S3ImageDeleter`` collects object keys from deleted products and removes
+them with batched ``delete_objects`` calls (at most 1000 keys per call),
+either when a full batch has accumulated or on a short flush interval.
+
+Run as a script to find ``products/`` objects that no product document
+references any more::
+
+    python s3_cleanup.py reconcile [--delete] [--grace-hours 24]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Set
+from urllib.parse import unquote, urlparse
+
+import metrics
+
+S3_DELETE_BATCH_SIZE = 1000  # delete_objects limit
+PRODUCT_IMAGE_PREFIX = "products/"
+
+KEYS_DELETED = metrics.counter(
+    "s3_image_keys_deleted_total",
+    "Product image objects removed from S3 by outcome",
+)
+KEYS_PENDING = metrics.gauge(
+    "s3_image_keys_pending",
+    "Product image objects waiting to be deleted",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def image_key_from_url(url: str, bucket: str) -> Optional[str]:
+    """Return the S3 key for one of our bucket URLs, or None (e.g. base64 fallbacks)"""
+    if not url or not url.startswith("https://"):
+        return None
+    parsed = urlparse(url)
+    if not parsed.netloc.startswith(f"{bucket}.s3."):
+        return None
+    key = unquote(parsed.path.lstrip("/"))
+    return key or None
+
+
+def product_image_keys(product: dict, bucket: str) -> List[str]:
+    """All S3 keys owned by a product: its images and any derived variants"""
+    urls = list(product.get("images") or []) + list(product.get("image_variants") or [])
+    keys = (image_key_from_url(url, bucket) for url in urls)
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def _chunks(items: List[str], size: int) -> Iterable[List[str]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def delete_keys(s3_client, bucket: str, keys: List[str]) -> List[str]:
+    """Delete keys in batches of up to 1000; return the keys that failed"""
+    failed = []
+    for batch in _chunks(keys, S3_DELETE_BATCH_SIZE):
+        try:
+            response = s3_client.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+            )
+        except Exception as e:
+            logger.warning("S3 delete_objects failed for %d keys: %s", len(batch), e)
+            failed.extend(batch)
+            continue
+        errors = [error["Key"] for error in response.get("Errors", [])]
+        failed.extend(errors)
+        KEYS_DELETED.inc(len(batch) - len(errors), outcome="deleted")
+        if errors:
+            KEYS_DELETED.inc(len(errors), outcome="failed")
+    return failed
+
+
+class S3ImageDeleter:
+    def __init__(self, get_client, bucket: str, flush_interval: float = 5.0, max_attempts: int = 3, keep_filter=None):
+        # Zero-argument callable returning the S3 client, so it is only built when needed
+        self.get_client = get_client
+        self.bucket = bucket
+        # Async callable returning the subset of keys that must not be deleted
+        self.keep_filter = keep_filter
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self._pending: dict = {}  # key -> attempts so far
+        self._flusher: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def enqueue(self, keys: List[str]):
+        for key in keys:
+            self._pending.setdefault(key, 0)
+        KEYS_PENDING.set(len(self._pending))
+        if len(self._pending) >= S3_DELETE_BATCH_SIZE:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            keys = list(batch)
+            if self.keep_filter is not None:
+                keep = await self.keep_filter(keys)
+                keys = [key for key in keys if key not in keep]
+            failed = await asyncio.to_thread(delete_keys, self.get_client(), self.bucket, keys) if keys else []
+            for key in failed:
+                attempts = batch[key] + 1
+                if attempts < self.max_attempts:
+                    self._pending[key] = max(self._pending.get(key, 0), attempts)
+                else:
+                    logger.warning("Giving up deleting %s; reconciliation will pick it up", key)
+            KEYS_PENDING.set(len(self._pending))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("S3 image flush failed")
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+
+
+def referenced_keys(db, bucket: str, collections: Iterable[str]) -> Set[str]:
+    """Every S3 key referenced by a product document in the given collections"""
+    keys = set()
+    for name in collections:
+        for product in db[name].find({}, {"_id": 0, "images": 1, "image_variants": 1}):
+            keys.update(product_image_keys(product, bucket))
+    return keys
+
+
+def find_orphans(s3_client, bucket: str, referenced: Set[str], grace: timedelta) -> List[str]:
+    """List ``products/`` objects page by page and return unreferenced ones.
+
+    Objects newer than ``grace`` are skipped so uploads whose product document
+    has not been written yet are never treated as orphans.
+    """
+    cutoff = datetime.now(timezone.utc) - grace
+    orphans = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=PRODUCT_IMAGE_PREFIX, PaginationConfig={"PageSize": 1000}):
+        for obj in page.get("Contents", []):
+            if obj["Key"] not in referenced and obj["LastModified"] < cutoff:
+                orphans.append(obj["Key"])
+    return orphans
+
+
+def reconcile(args):
+    import boto3
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    bucket = os.environ['S3_BUCKET_NAME']
+    s3_client = boto3.client(
+        's3',
+        aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+        aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
+        region_name=os.environ['AWS_REGION']
+    )
+    mongo = MongoClient(os.environ['MONGO_URL'])
+    db = mongo[os.environ['DB_NAME']]
+
+    referenced = referenced_keys(db, bucket, args.collections)
+    orphans = find_orphans(s3_client, bucket, referenced, timedelta(hours=args.grace_hours))
+    print(f"{len(referenced)} referenced keys, {len(orphans)} orphaned objects under {PRODUCT_IMAGE_PREFIX}")
+    for key in orphans:
+        print(f"  {key}")
+
+    if args.delete and orphans:
+        failed = delete_keys(s3_client, bucket, orphans)
+        # Drop the reference records of content-addressed orphans too
+        failed = set(failed)
+        deleted = [key for key in orphans if key not in failed]
+        db.images.delete_many({"_id": {"$in": deleted}})
+        print(f"Deleted {len(deleted)} objects, {len(failed)} failed")
+    mongo.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Product image cleanup for S3")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    reconcile_parser = subcommands.add_parser("reconcile", help="Find (and optionally delete) orphaned product images")
+    reconcile_parser.add_argument("--delete", action="store_true", help="Delete orphans instead of only listing them")
+    reconcile_parser.add_argument("--grace-hours", type=float, default=24, help="Ignore objects newer than this")
+    reconcile_parser.add_argument(
+        "--collections", nargs="+", default=["products", "products_archive"],
+        help="Collections whose product documents reference images"
+    )
+    args = parser.parse_args()
+    if args.command == "reconcile":
+        reconcile(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""Synthetic data for local scale testing.
+
+Generates users, products (all four categories, long-tailed prices, mostly
+recent listings, older ones more likely sold), sessions and payment tokens,
+and writes them with batched ``insert_many`` from parallel worker processes.
+Every document is derived from ``--seed`` and its own index, so the same
+arguments always produce the same data regardless of worker count.
+Unsold products are also written to the listing feed.
+
+    python seed.py --users 10000 --products 1000000 --workers 8 [--drop]
+    python seed.py --products 50000 --s3-endpoint http://localhost:9000 --s3-bucket thaparmart-local
+
+Indexes are not created here; the API creates them on startup (building them
+after a bulk load is faster than maintaining them during it).
+"""
+import argparse
+import hashlib
+import math
+import os
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+from product_feed import FEED_COLLECTION, feed_document
+
+CATEGORIES = ["Electronics", "Clothes", "Stationery", "Notes"]
+CATEGORY_WEIGHTS = [0.3, 0.25, 0.2, 0.25]
+# Median price and spread (lognormal sigma) per category, in rupees
+PRICE_PROFILES = {
+    "Electronics": (2500, 1.0),
+    "Clothes": (600, 0.7),
+    "Stationery": (120, 0.6),
+    "Notes": (80, 0.5),
+}
+ITEMS = {
+    "Electronics": ["Scientific Calculator", "Laptop", "Headphones", "Monitor", "Keyboard", "Arduino Kit", "Power Bank"],
+    "Clothes": ["Hoodie", "Lab Coat", "Jacket", "Sneakers", "Formal Shirt", "Fest T-Shirt"],
+    "Stationery": ["Drafter", "Lab Manual", "Geometry Box", "Notebook Set", "Engineering Drawing Kit"],
+    "Notes": ["Mathematics Notes", "Physics Notes", "Thermodynamics Notes", "DSA Notes", "Electrical Notes"],
+}
+CONDITIONS = ["Brand new", "Like new", "Gently used", "Used for one semester", "Well used but works"]
+FIRST_NAMES = ["Aarav", "Vivaan", "Aditya", "Ishaan", "Arjun", "Kabir", "Ananya", "Diya", "Saanvi", "Meera",
+               "Riya", "Simran", "Harpreet", "Gurleen", "Rohan", "Karan", "Neha", "Pooja", "Manav", "Tanvi"]
+LAST_NAMES = ["Sharma", "Verma", "Singh", "Gupta", "Kaur", "Mehta", "Bansal", "Garg", "Arora", "Malhotra",
+              "Kapoor", "Jain", "Chopra", "Sethi", "Grewal"]
+BRANCHES = ["COE", "ECE", "EE", "ME", "CE", "CHE", "BT", "EIC"]
+DEPARTMENTS = ["Computer Science", "Electronics", "Mechanical", "Civil", "Chemical", "Mathematics", "Physics"]
+PLACEHOLDER_PREFIX = "products/"
+PLACEHOLDER_COLORS = ["#f59e0b", "#3b82f6", "#10b981", "#ef4444", "#8b5cf6"]
+
+SEEDED_COLLECTIONS = ["users", "products", FEED_COLLECTION, "sessions", "payment_tokens", "images"]
+
+_db = None  # per-worker database handle, set by _init_worker
+
+
+def _rng(seed: int, kind: str, index: int) -> random.Random:
+    return random.Random(f"{seed}:{kind}:{index}")
+
+
+def _uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _days_ago(now: datetime, days: float) -> datetime:
+    return now - timedelta(days=days)
+
+
+def make_user(seed: int, index: int, now: datetime) -> dict:
+    rng = _rng(seed, "user", index)
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    email = f"{first.lower()}.{last.lower()}{index}@thapar.edu"
+    is_faculty = rng.random() < 0.05
+    return {
+        "id": _uuid(rng),
+        "email": email,
+        "name": f"{first} {last}",
+        "picture": None,
+        "phone": f"+91{rng.randint(6000000000, 9999999999)}",
+        "bio": rng.choice([None, None, "Selling stuff I no longer need", "Final year, clearing out my room"]),
+        "first_name": first,
+        "last_name": last,
+        "thapar_email": email,
+        "is_faculty": is_faculty,
+        "branch": None if is_faculty else rng.choice(BRANCHES),
+        "roll_number": None if is_faculty else str(102100000 + index),
+        "batch": None if is_faculty else str(rng.randint(2021, 2028)),
+        "department": rng.choice(DEPARTMENTS) if is_faculty else None,
+        "is_registered": True,
+        "created_at": _days_ago(now, min(rng.expovariate(1 / 200), 730)),
+    }
+
+
+def _seller_index(rng: random.Random, users: int) -> int:
+    # Long tail: a few sellers list a lot, most list one or two items
+    return min(int(rng.paretovariate(1.2)) - 1, users - 1) if rng.random() < 0.5 else rng.randrange(users)
+
+
+def make_product(seed: int, index: int, users: int, now: datetime, image_urls: Optional[dict] = None) -> dict:
+    rng = _rng(seed, "product", index)
+    seller = make_user(seed, _seller_index(rng, users), now)
+    category = rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]
+    median, sigma = PRICE_PROFILES[category]
+    price = max(10, round(rng.lognormvariate(math.log(median), sigma) / 10) * 10)
+    age_days = min(rng.expovariate(1 / 45), 540)
+    created_at = _days_ago(now, age_days)
+    # Older listings are more likely to have sold
+    is_sold = rng.random() < 1 - math.exp(-age_days / 60)
+    item = rng.choice(ITEMS[category])
+    images = []
+    if image_urls:
+        images = rng.sample(image_urls[category], rng.randint(1, min(3, len(image_urls[category]))))
+    return {
+        "id": _uuid(rng),
+        "title": f"{item} - {rng.choice(CONDITIONS).lower()}",
+        "description": f"{rng.choice(CONDITIONS)}. {item} for sale, pick up from campus. Price slightly negotiable.",
+        "price": float(price),
+        "category": category,
+        "images": images,
+        "seller_id": seller["id"],
+        "seller_name": seller["name"],
+        "seller_email": seller["email"],
+        "seller_phone": seller["phone"],
+        "is_sold": is_sold,
+        "sold_at": created_at + timedelta(days=rng.uniform(0, age_days)) if is_sold else None,
+        "created_at": created_at,
+    }
+
+
+def make_session(seed: int, index: int, users: int, now: datetime) -> dict:
+    rng = _rng(seed, "session", index)
+    user = make_user(seed, rng.randrange(users), now)
+    created_at = _days_ago(now, rng.uniform(0, 10))
+    return {
+        "id": _uuid(rng),
+        "user_id": user["id"],
+        "session_token": _uuid(rng),
+        "expires_at": created_at + timedelta(days=7),
+        "created_at": created_at,
+    }
+
+
+def make_payment_token(seed: int, index: int, users: int, now: datetime) -> dict:
+    rng = _rng(seed, "payment_token", index)
+    user = make_user(seed, rng.randrange(users), now)
+    status = rng.choices(["used", "paid", "created"], [0.7, 0.2, 0.1])[0]
+    created_at = _days_ago(now, min(rng.expovariate(1 / 60), 365))
+    return {
+        "id": _uuid(rng),
+        "user_id": user["id"],
+        "payment_id": "" if status == "created" else f"pay_seed{index:010d}",
+        "order_id": f"order_seed{index:010d}",
+        "amount": 2000,
+        "status": status,
+        "expires_at": created_at + timedelta(hours=1),
+        "created_at": created_at,
+    }
+
+
+def _init_worker(mongo_url: str, db_name: str):
+    global _db
+    from pymongo import MongoClient
+    _db = MongoClient(mongo_url)[db_name]
+
+
+def _insert_batch(kind: str, start: int, stop: int, seed: int, users: int, now: datetime, image_urls: Optional[dict]) -> int:
+    from pymongo import UpdateOne
+
+    if kind == "users":
+        _db.users.insert_many([make_user(seed, index, now) for index in range(start, stop)], ordered=False)
+    elif kind == "products":
+        products = [make_product(seed, index, users, now, image_urls) for index in range(start, stop)]
+        _db.products.insert_many(products, ordered=False)
+        unsold = [feed_document(product) for product in products if not product["is_sold"]]
+        if unsold:
+            _db[FEED_COLLECTION].insert_many(unsold, ordered=False)
+        references = {}
+        for product in products:
+            for url in product["images"]:
+                key = PLACEHOLDER_PREFIX + url.rsplit("/", 1)[-1]
+                references.setdefault(key, []).append(product["id"])
+        if references:
+            _db.images.bulk_write([
+                UpdateOne(
+                    {"_id": key},
+                    {"$addToSet": {"product_ids": {"$each": product_ids}}, "$setOnInsert": {"status": "stored"}},
+                    upsert=True
+                )
+                for key, product_ids in references.items()
+            ], ordered=False)
+    elif kind == "sessions":
+        _db.sessions.insert_many([make_session(seed, index, users, now) for index in range(start, stop)], ordered=False)
+    elif kind == "payment_tokens":
+        _db.payment_tokens.insert_many(
+            [make_payment_token(seed, index, users, now) for index in range(start, stop)], ordered=False
+        )
+    return stop - start
+
+
+def placeholder_svg(category: str, color: str) -> bytes:
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="400" height="300">'
+        f'<rect width="100%" height="100%" fill="{color}"/>'
+        f'<text x="50%" y="50%" font-size="32" text-anchor="middle" fill="#fff">{category}</text></svg>'
+    ).encode("utf-8")
+
+
+def upload_placeholders(endpoint: str, bucket: str) -> dict:
+    """Upload a few content-addressed placeholder images per category; returns their URLs"""
+    import boto3
+
+    s3_client = boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", "seed"),
+        aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", "seedseed"),
+        region_name=os.environ.get("AWS_REGION", "us-east-1"),
+    )
+    existing = [b["Name"] for b in s3_client.list_buckets().get("Buckets", [])]
+    if bucket not in existing:
+        s3_client.create_bucket(Bucket=bucket)
+
+    urls = {}
+    for category in CATEGORIES:
+        urls[category] = []
+        for color in PLACEHOLDER_COLORS:
+            content = placeholder_svg(category, color)
+            key = f"{PLACEHOLDER_PREFIX}{hashlib.sha256(content).hexdigest()}.svg"
+            s3_client.put_object(
+                Bucket=bucket, Key=key, Body=content, ContentType="image/svg+xml",
+                CacheControl="public, max-age=31536000, immutable"
+            )
+            urls[category].append(f"{endpoint.rstrip('/')}/{bucket}/{key}")
+    return urls
+
+
+def seed_collection(executor, kind: str, total: int, args, now: datetime, image_urls: Optional[dict]):
+    if total <= 0:
+        return
+    started = time.perf_counter()
+    futures = [
+        executor.submit(_insert_batch, kind, start, min(start + args.batch_size, total), args.seed, args.users, now, image_urls)
+        for start in range(0, total, args.batch_size)
+    ]
+    done = 0
+    for future in as_completed(futures):
+        done += future.result()
+        if done == total or done % (args.batch_size * 50) == 0:
+            elapsed = time.perf_counter() - started
+            print(f"  {kind}: {done}/{total} ({done / elapsed:,.0f} docs/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed the database with synthetic data for scale testing")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--payment-tokens", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42, help="Same seed and counts give the same data")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per insert_many")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parallel generator processes")
+    parser.add_argument("--drop", action="store_true", help=f"Drop {', '.join(SEEDED_COLLECTIONS)} first")
+    parser.add_argument("--s3-endpoint", help="Local S3 stand-in (e.g. MinIO) for placeholder images")
+    parser.add_argument("--s3-bucket", default="thaparmart-local")
+    parser.add_argument(
+        "--reference-time", type=datetime.fromisoformat,
+        help="ISO timestamp that generated dates are relative to (default: the current hour)"
+    )
+    args = parser.parse_args()
+    if args.users < 1:
+        parser.error("--users must be at least 1")
+
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    mongo_url, db_name = os.environ['MONGO_URL'], os.environ['DB_NAME']
+    # Dates are relative to one fixed instant; pass --reference-time to reproduce them exactly
+    now = args.reference_time or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+
+    if args.drop:
+        mongo = MongoClient(mongo_url)
+        for name in SEEDED_COLLECTIONS:
+            mongo[db_name].drop_collection(name)
+        mongo.close()
+        print(f"Dropped {', '.join(SEEDED_COLLECTIONS)}")
+
+    image_urls = upload_placeholders(args.s3_endpoint, args.s3_bucket) if args.s3_endpoint else None
+
+    print(f"Seeding {db_name} with seed {args.seed} using {args.workers} workers")
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(mongo_url, db_name)) as executor:
+        seed_collection(executor, "users", args.users, args, now, image_urls)
+        seed_collection(executor, "products", args.products, args, now, image_urls)
+        seed_collection(executor, "sessions", args.sessions, args, now, image_urls)
+        seed_collection(executor, "payment_tokens", args.payment_tokens, args, now, image_urls)
+    print("Done. Start the API to build indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,180 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Depends, UploadFile, File, Form, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-import os
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
+import pymongo
+from pymongo.errors import BulkWriteError
+from pymongo.read_preferences import ReadPreference, SecondaryPreferred
 import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
 import base64
+import hashlib
+import heapq
+import itertools
 import json
-import boto3
-from botocore.exceptions import ClientError
-import razorpay
+import time
+
+import metrics
+import tracing
+from access_log import AccessLogMiddleware, configure_logging
+from archival import ARCHIVE_COLLECTION, ProductArchiver
+from db_monitoring import DbTimingListener, PoolStatsListener
+from events import ProductEventHub, product_event
+from indexes import create_indexes as create_collection_indexes
+from product_feed import (
+    FEED_COLLECTION, add_to_feed, feed_needs_build, rebuild_feed, remove_from_feed,
+    sync_seller_fields,
+)
+from queries import PRODUCT_SORTS, SELLER_PRODUCTS_SORT, paid_tokens_filter, product_listing, session_filter
+from rate_limit import MongoRateLimitBackend, RateLimitMiddleware, ShardedMemoryBackend, load_policies
+from request_context import get_request_context, timed
+from s3_cleanup import S3ImageDeleter, product_image_keys
+from settings import Settings
+from shared_cache import SharedSlotCache
+from signed_sessions import SignedSessionManager
+from single_flight import SingleFlight
+from task_queue import BackgroundTaskQueue
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# AWS S3 configuration
-s3_client = boto3.client(
-    's3',
-    aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-    aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
-    region_name=os.environ['AWS_REGION']
-)
-S3_BUCKET_NAME = os.environ['S3_BUCKET_NAME']
+logger = logging.getLogger(__name__)
 
-# Razorpay configuration
-razorpay_client = razorpay.Client(auth=(os.environ['RAZORPAY_KEY_ID'], os.environ['RAZORPAY_KEY_SECRET']))
+# Clients and shared resources. These are created by init_resources() when
+# the app starts (see create_app's lifespan), never at import time.
+settings: Settings = Settings.from_env()
+client: Optional[AsyncIOMotorClient] = None
+db = None
+# Same database with a secondaryPreferred read preference for public catalog reads
+catalog_db = None
+http_client: Optional[httpx.AsyncClient] = None
+rate_limit_backend = None
+shared_cache: Optional[SharedSlotCache] = None
+background_queue: Optional[BackgroundTaskQueue] = None
+product_events: Optional[ProductEventHub] = None
+s3_image_deleter: Optional[S3ImageDeleter] = None
+product_archiver: Optional[ProductArchiver] = None
+product_list_flight: Optional[SingleFlight] = None
+product_detail_flight: Optional[SingleFlight] = None
+session_manager: Optional[SignedSessionManager] = None
+pool_stats = PoolStatsListener()
+# Set once shutdown starts so the readiness probe takes this worker out of rotation
+shutting_down = False
+
+SSE_HEARTBEAT_SECONDS = 15
+SESSION_TTL_DAYS = 7
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    """Create the S3 client on first use; boto3 is slow to import"""
+    import boto3
+    return boto3.client(
+        's3',
+        aws_access_key_id=settings.aws_access_key_id,
+        aws_secret_access_key=settings.aws_secret_access_key,
+        region_name=settings.aws_region
+    )
 
-# Create the main app without a prefix
-app = FastAPI()
+@lru_cache(maxsize=None)
+def get_razorpay_client():
+    """Create the Razorpay client on first use; only payment routes need it"""
+    import razorpay
+    return razorpay.Client(auth=(settings.razorpay_key_id, settings.razorpay_key_secret))
+
+def init_resources(app_settings: Settings):
+    """Create the Mongo client and the in-process helpers that depend on it"""
+    global settings, client, db, catalog_db, http_client, rate_limit_backend, shared_cache
+    global background_queue, product_events, s3_image_deleter, product_archiver, pool_stats, shutting_down
+    global product_list_flight, product_detail_flight, session_manager
+    
+    settings = app_settings
+    pool_stats = PoolStatsListener()
+    shutting_down = False
+    get_s3_client.cache_clear()
+    get_razorpay_client.cache_clear()
+    
+    client = AsyncIOMotorClient(
+        settings.mongo_url,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxPoolSize=settings.mongo_max_pool_size,
+        event_listeners=[
+            DbTimingListener(slow_ms=settings.mongo_slow_command_ms), pool_stats, *tracing.configured_listeners()
+        ]
+    )
+    # Auth, payments and every write go to the primary. Public catalog reads
+    # may be served by a secondary at most catalog_max_staleness seconds behind.
+    db = client.get_database(settings.db_name, read_preference=ReadPreference.PRIMARY)
+    catalog_db = client.get_database(
+        settings.db_name,
+        read_preference=SecondaryPreferred(max_staleness=settings.catalog_max_staleness)
+    )
+    http_client = httpx.AsyncClient(timeout=10.0)
+    
+    # Rate limiting ("memory" keeps buckets per worker, "mongo" shares them)
+    if settings.rate_limit_backend == 'mongo':
+        rate_limit_backend = MongoRateLimitBackend(db.rate_limits)
+    else:
+        rate_limit_backend = ShardedMemoryBackend()
+    
+    # Cross-worker cache for session and user lookups. Entries expire after
+    # shared_cache_ttl seconds, which bounds staleness for writes made elsewhere.
+    shared_cache = SharedSlotCache(settings.shared_cache_name, slots=settings.shared_cache_slots)
+    
+    # Bounded queue for work that does not need to finish before the response
+    background_queue = BackgroundTaskQueue(
+        maxsize=settings.background_queue_size,
+        workers=settings.background_workers,
+        max_retries=settings.background_job_retries
+    )
+    
+    # Live product events for the SSE feed ("local" or "change_stream" fan-out)
+    product_events = ProductEventHub(
+        db.product_events,
+        fanout=settings.product_events_fanout,
+        buffer_size=settings.product_events_buffer
+    )
+    
+    # Images of deleted products are removed in batched delete_objects calls
+    s3_image_deleter = S3ImageDeleter(get_s3_client, settings.s3_bucket_name, keep_filter=referenced_image_keys)
+    
+    # Signed session tokens are verified in-process; None in "opaque" mode
+    session_manager = None
+    if settings.session_mode == "signed":
+        session_manager = SignedSessionManager(
+            db,
+            settings.jwt_secret,
+            ttl=timedelta(days=SESSION_TTL_DAYS),
+            sync_interval=settings.session_sync_interval
+        )
+    
+    # Concurrent identical catalog reads share one query and serialized body
+    product_list_flight = SingleFlight("/products")
+    product_detail_flight = SingleFlight("/products/{product_id}")
+    
+    # Products sold more than archive_after_days ago move to products_archive
+    product_archiver = ProductArchiver(
+        db,
+        older_than_days=settings.archive_after_days,
+        batch_size=settings.archive_batch_size,
+        interval=settings.archive_interval
+    )
+
+async def publish_product_events(event_type: str, products: List[dict]):
+    """Queue product events for publishing after the response is sent"""
+    for product in products:
+        await background_queue.submit(
+            "publish_product_event", product_events.publish, product_event(event_type, product)
+        )
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -101,6 +237,7 @@ class Product(BaseModel):
     seller_email: str
     seller_phone: str  # Added seller phone number
     is_sold: bool = False
+    sold_at: Optional[datetime] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ProductCreate(BaseModel):
@@ -109,6 +246,41 @@ class ProductCreate(BaseModel):
     price: float
     category: str
 
+# Upper bound on product IDs or NDJSON lines handled by one bulk request
+MAX_BULK_PRODUCTS = 100
+
+class BulkProductIds(BaseModel):
+    product_ids: List[str] = Field(..., min_length=1, max_length=MAX_BULK_PRODUCTS)
+
+class PublicUser(BaseModel):
+    id: str
+    name: str
+    picture: Optional[str] = None
+    bio: Optional[str] = None
+    is_faculty: bool = False
+    branch: Optional[str] = None
+    batch: Optional[str] = None
+    department: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+# Upper bound on user IDs resolved by one batched lookup
+MAX_USER_LOOKUP = 100
+
+class UserLookup(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=MAX_USER_LOOKUP)
+
+class UserLookupResult(BaseModel):
+    id: str
+    found: bool
+    user: Optional[PublicUser] = None
+
+class Storefront(BaseModel):
+    user: User
+    products: List[Product]
+    next_cursor: Optional[str] = None
+    active_count: int
+    sold_count: int
+
 class Session(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
@@ -137,37 +309,126 @@ class PaymentVerification(BaseModel):
     razorpay_signature: str
 
 # Authentication helpers
-async def upload_image_to_s3(image_content: bytes, filename: str, content_type: str) -> str:
-    """Upload image to S3 and return the public URL. Fallback to base64 if S3 fails."""
+# Content-addressed images never change, so clients may cache them forever
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+IMAGE_READ_CHUNK_SIZE = 64 * 1024
+
+async def read_image_upload(image: UploadFile):
+    """Read an uploaded image in chunks, hashing it as it streams in"""
+    digest = hashlib.sha256()
+    content = bytearray()
+    while True:
+        chunk = await image.read(IMAGE_READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        digest.update(chunk)
+        content.extend(chunk)
+    return bytes(content), digest.hexdigest()
+
+def image_key_for(digest: str, filename: str) -> str:
+    """S3 key for image content: its SHA-256 plus the original extension"""
+    extension = Path(filename or "").suffix.lower()[:10]
+    return f"products/{digest}{extension}"
+
+def s3_object_exists(key: str) -> bool:
+    from botocore.exceptions import ClientError
+    try:
+        get_s3_client().head_object(Bucket=settings.s3_bucket_name, Key=key)
+        return True
+    except ClientError:
+        return False
+
+async def upload_image_to_s3(image_content: bytes, filename: str, content_type: str, digest: str, product_id: str) -> str:
+    """Upload image to S3 and return the public URL. Fallback to base64 if S3 fails.
+
+    Objects are keyed by content hash and ``db.images`` records the IDs of
+    the products referencing each one; content that is already stored is not
+    uploaded again.
+    """
     try:
-        # Generate unique filename
-        unique_filename = f"products/{uuid.uuid4()}_{filename}"
+        key = image_key_for(digest, filename)
         
-        # Upload to S3
-        s3_client.put_object(
-            Bucket=S3_BUCKET_NAME,
-            Key=unique_filename,
-            Body=image_content,
-            ContentType=content_type,
-            ACL='public-read'  # Make images publicly accessible
+        # Take a reference; an existing "stored" record means S3 already has the object
+        existing = await db.images.find_one_and_update(
+            {"_id": key},
+            {
+                "$addToSet": {"product_ids": product_id},
+                "$setOnInsert": {
+                    "sha256": digest,
+                    "size": len(image_content),
+                    "content_type": content_type,
+                    "status": "pending",
+                    "created_at": datetime.now(timezone.utc)
+                }
+            },
+            upsert=True
         )
         
+        if existing is None or existing.get("status") != "stored":
+            try:
+                # A pending record may belong to an upload that is still running
+                confirmed = False
+                if existing is not None:
+                    with timed("s3"), tracing.span("s3.head_object", bucket=settings.s3_bucket_name):
+                        confirmed = await asyncio.to_thread(s3_object_exists, key)
+                if not confirmed:
+                    with timed("s3"), tracing.span("s3.put_object", bucket=settings.s3_bucket_name, size=len(image_content)):
+                        await asyncio.to_thread(
+                            get_s3_client().put_object,
+                            Bucket=settings.s3_bucket_name,
+                            Key=key,
+                            Body=image_content,
+                            ContentType=content_type,
+                            CacheControl=IMAGE_CACHE_CONTROL,
+                            ACL='public-read'  # Make images publicly accessible
+                        )
+            except Exception:
+                await db.images.update_one({"_id": key}, {"$pull": {"product_ids": product_id}})
+                await db.images.delete_one({"_id": key, "product_ids": {"$size": 0}, "status": "pending"})
+                raise
+            await db.images.update_one({"_id": key}, {"$set": {"status": "stored"}})
+        
         # Return public URL
-        return f"https://{S3_BUCKET_NAME}.s3.{os.environ['AWS_REGION']}.amazonaws.com/{unique_filename}"
+        return f"https://{settings.s3_bucket_name}.s3.{settings.aws_region}.amazonaws.com/{key}"
     
-    except ClientError as e:
-        logging.warning(f"S3 upload failed, using base64 fallback: {e}")
-        # Fallback to base64 encoding for demo purposes
-        import base64
-        encoded_image = base64.b64encode(image_content).decode('utf-8')
-        return f"data:{content_type};base64,{encoded_image}"
     except Exception as e:
-        logging.warning(f"S3 upload failed, using base64 fallback: {e}")
+        logger.warning("S3 upload failed, using base64 fallback: %s", e)
         # Fallback to base64 encoding
-        import base64
         encoded_image = base64.b64encode(image_content).decode('utf-8')
         return f"data:{content_type};base64,{encoded_image}"
 
+async def release_image_keys(product_id: str, keys: List[str]):
+    """Drop a product's reference to each key and delete objects nobody references any more.
+
+    Safe to run again after a partial failure: a reference that is already
+    gone is not dropped twice. Keys without an ``images`` record predate
+    content addressing and belong to a single product, so they are deleted
+    directly; the deleter skips any key that gained a reference meanwhile.
+    """
+    to_delete = []
+    for key in keys:
+        record = await db.images.find_one_and_update(
+            {"_id": key, "product_ids": product_id},
+            {"$pull": {"product_ids": product_id}},
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        if record is None:
+            record = await db.images.find_one({"_id": key}, {"product_ids": 1})
+        if record is None:
+            to_delete.append(key)
+            continue
+        if not record.get("product_ids"):
+            result = await db.images.delete_one({"_id": key, "product_ids": {"$size": 0}})
+            if result.deleted_count:
+                to_delete.append(key)
+    if to_delete:
+        await s3_image_deleter.enqueue(to_delete)
+
+async def referenced_image_keys(keys: List[str]) -> set:
+    """Keys that gained a new reference after being queued for deletion"""
+    records = await db.images.find({"_id": {"$in": keys}, "product_ids.0": {"$exists": True}}, {"_id": 1}).to_list(length=None)
+    return {record["_id"] for record in records}
+
 async def get_current_user(request: Request):
     # Check for session token in cookies first
     session_token = request.cookies.get('session_token')
@@ -181,21 +442,67 @@ async def get_current_user(request: Request):
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Check if session exists and is not expired
-    session = await db.sessions.find_one({
-        "session_token": session_token,
-        "expires_at": {"$gt": datetime.now(timezone.utc)}
-    })
+    if session_manager is not None and is_signed_token(session_token):
+        # Signature, expiry and revocation are all checked in memory
+        user_id = session_manager.verify(session_token)
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Invalid or expired session")
+    else:
+        user_id = await get_opaque_session_user(session_token)
     
-    if not session:
-        raise HTTPException(status_code=401, detail="Invalid or expired session")
+    # Tag the request for access logging
+    context = get_request_context()
+    if context is not None:
+        context.user_id = user_id
     
     # Get user data
-    user = await db.users.find_one({"id": session["user_id"]})
+    return await get_cached_user(user_id)
+
+def is_signed_token(session_token: str) -> bool:
+    # Opaque tokens are UUIDs; signed ones are JWTs (header.payload.signature)
+    return session_token.count(".") == 2
+
+async def get_opaque_session_user(session_token: str) -> str:
+    """Resolve an opaque session token through the shared cache, falling back to Mongo"""
+    user_id = shared_cache.get(f"session:{session_token}")
+    if user_id is None:
+        now = datetime.now(timezone.utc)
+        session = await db.sessions.find_one(session_filter(session_token, now))
+        
+        if not session:
+            raise HTTPException(status_code=401, detail="Invalid or expired session")
+        
+        user_id = session["user_id"]
+        # Never cache a session past its own expiry
+        expires_at = session["expires_at"]
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        shared_cache.set(
+            f"session:{session_token}",
+            user_id,
+            min(settings.shared_cache_ttl, (expires_at - now).total_seconds())
+        )
+    return user_id
+
+async def get_cached_user(user_id: str, database=None) -> User:
+    """Load a user through the shared cache, falling back to Mongo.
+
+    Only reads from the primary are cached, so a lagging secondary never puts
+    a stale user into the cache that authentication reads from.
+    """
+    cached = shared_cache.get(f"user:{user_id}")
+    if cached is not None:
+        return User(**cached)
+    
+    database = db if database is None else database
+    user = await database.users.find_one({"id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return User(**user)
+    user = User(**user)
+    if database is db:
+        shared_cache.set(f"user:{user_id}", user.model_dump(mode="json"), settings.shared_cache_ttl)
+    return user
 
 # Registration and Login Check routes
 @api_router.post("/auth/register")
@@ -283,17 +590,17 @@ async def check_user_exists(thapar_email_prefix: str = Form(...)):
 async def authenticate_session(session_id: str = Form(...), response: Response = Response()):
     """Exchange Emergent session ID for user data and create local session"""
     
-    # Call Emergent auth API
-    async with httpx.AsyncClient() as client:
-        try:
-            auth_response = await client.get(
+    # Call Emergent auth API over the shared, already-warm connection pool
+    try:
+        with tracing.span("emergent.session_data"):
+            auth_response = await http_client.get(
                 "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers={"X-Session-ID": session_id}
+                headers=tracing.inject_headers({"X-Session-ID": session_id})
             )
-            auth_response.raise_for_status()
-            user_data = auth_response.json()
-        except Exception as e:
-            raise HTTPException(status_code=401, detail=f"Failed to authenticate: {str(e)}")
+        auth_response.raise_for_status()
+        user_data = auth_response.json()
+    except Exception as e:
+        raise HTTPException(status_code=401, detail=f"Failed to authenticate: {str(e)}")
     
     # First, try to find user by thapar_email (for registered users)
     existing_user = None
@@ -339,30 +646,30 @@ async def authenticate_session(session_id: str = Form(...), response: Response =
         if not existing_user.get("first_name") or not existing_user.get("last_name"):
             update_data["name"] = user_data["name"]
         
-        await db.users.update_one(
-            {"id": existing_user["id"]},
-            {"$set": update_data}
+        # Persist the refreshed auth data after the response is sent
+        await background_queue.submit(
+            "update_user_after_login", update_user_after_login, existing_user["id"], update_data
         )
-        
-        # Get updated user
-        updated_user = await db.users.find_one({"id": existing_user["id"]})
-        user = User(**updated_user)
+        user = User(**{**existing_user, **update_data})
     
     # Create session
-    session_token = str(uuid.uuid4())
-    session = Session(
-        user_id=user.id,
-        session_token=session_token,
-        expires_at=datetime.now(timezone.utc) + timedelta(days=7)
-    )
-    
-    await db.sessions.insert_one(session.dict())
+    if session_manager is not None:
+        generation = existing_user.get("session_generation", 0) if existing_user else 0
+        session_token, _ = session_manager.issue(user.id, generation)
+    else:
+        session_token = str(uuid.uuid4())
+        session = Session(
+            user_id=user.id,
+            session_token=session_token,
+            expires_at=datetime.now(timezone.utc) + timedelta(days=SESSION_TTL_DAYS)
+        )
+        await db.sessions.insert_one(session.dict())
     
     # Set HTTP-only cookie
     response.set_cookie(
         key="session_token",
         value=session_token,
-        max_age=7 * 24 * 60 * 60,  # 7 days
+        max_age=SESSION_TTL_DAYS * 24 * 60 * 60,
         httponly=True,
         secure=True,
         samesite="none",
@@ -371,6 +678,13 @@ async def authenticate_session(session_id: str = Form(...), response: Response =
     
     return user
 
+async def update_user_after_login(user_id: str, update_data: dict):
+    await db.users.update_one(
+        {"id": user_id},
+        {"$set": update_data}
+    )
+    shared_cache.delete(f"user:{user_id}")
+
 @api_router.get("/auth/me", response_model=User)
 async def get_current_user_info(user: User = Depends(get_current_user)):
     """Get current user information"""
@@ -380,14 +694,32 @@ async def get_current_user_info(user: User = Depends(get_current_user)):
 async def logout(request: Request, response: Response):
     """Logout current user"""
     session_token = request.cookies.get('session_token')
-    if session_token:
+    if session_token and session_manager is not None and is_signed_token(session_token):
+        claims = session_manager.decode(session_token)
+        if claims:
+            await session_manager.revoke(claims)
+    elif session_token:
         # Delete session from database
         await db.sessions.delete_one({"session_token": session_token})
+        shared_cache.delete(f"session:{session_token}")
     
     # Clear cookie
     response.delete_cookie(key="session_token", path="/")
     return {"message": "Logged out successfully"}
 
+@api_router.post("/auth/logout-all")
+async def logout_all(response: Response, user: User = Depends(get_current_user)):
+    """Log the current user out of every session, on every device"""
+    sessions = await db.sessions.find({"user_id": user.id}, {"_id": 0, "session_token": 1}).to_list(length=None)
+    await db.sessions.delete_many({"user_id": user.id})
+    for session in sessions:
+        shared_cache.delete(f"session:{session['session_token']}")
+    if session_manager is not None:
+        await session_manager.revoke_all(user.id)
+    
+    response.delete_cookie(key="session_token", path="/")
+    return {"message": "Logged out of all sessions"}
+
 # User routes
 @api_router.put("/users/profile", response_model=User)
 async def update_profile(
@@ -402,18 +734,96 @@ async def update_profile(
             {"id": user.id},
             {"$set": update_data}
         )
+        shared_cache.delete(f"user:{user.id}")
+        # Seller details are copied onto each listing; refresh them off the request path
+        await background_queue.submit("sync_seller_fields", sync_seller_fields, db, user.id, update_data)
     
     # Return updated user
     updated_user = await db.users.find_one({"id": user.id})
     return User(**updated_user)
 
+async def lookup_users(user_ids: List[str]) -> List[UserLookupResult]:
+    """Resolve user IDs with a single $in query, preserving request order"""
+    projection = {"_id": 0, **{field: 1 for field in PublicUser.model_fields}}
+    users = await db.users.find(
+        {"id": {"$in": list(set(user_ids))}},
+        projection
+    ).to_list(length=None)
+    by_id = {user["id"]: user for user in users}
+    return [
+        UserLookupResult(id=user_id, found=True, user=PublicUser(**by_id[user_id]))
+        if user_id in by_id else UserLookupResult(id=user_id, found=False)
+        for user_id in user_ids
+    ]
+
+@api_router.get("/users", response_model=List[UserLookupResult])
+async def get_users(ids: str):
+    """Get public profiles for a comma-separated list of user IDs"""
+    user_ids = [user_id.strip() for user_id in ids.split(",") if user_id.strip()]
+    if not user_ids:
+        raise HTTPException(status_code=400, detail="At least one user ID is required")
+    if len(user_ids) > MAX_USER_LOOKUP:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_USER_LOOKUP} users can be looked up at once")
+    return await lookup_users(user_ids)
+
+@api_router.post("/users/lookup", response_model=List[UserLookupResult])
+async def lookup_users_batch(lookup: UserLookup):
+    """Get public profiles for a list of user IDs (for lists too long for a query string)"""
+    return await lookup_users(lookup.ids)
+
 @api_router.get("/users/{user_id}", response_model=User)
 async def get_user_profile(user_id: str):
     """Get user profile by ID"""
-    user = await db.users.find_one({"id": user_id})
+    return await get_cached_user(user_id, database=catalog_db)
+
+@api_router.get("/users/{user_id}/storefront", response_model=Storefront)
+async def get_user_storefront(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_archived: bool = False
+):
+    """Get a seller's profile, a page of their listings and listing counts in one request.
+
+    With include_archived, archived sold products are merged into the page
+    and counted as sold.
+    """
+    query = {"seller_id": user_id}
+    if cursor:
+        last_created_at, last_id = decode_product_cursor(cursor, "created_at")
+        query["$or"] = [
+            {"created_at": {"$lt": last_created_at}},
+            {"created_at": last_created_at, "id": {"$lt": last_id}}
+        ]
+    
+    lookups = [
+        db.users.find_one({"id": user_id}),
+        db.products.find(query).sort(SELLER_PRODUCTS_SORT).limit(limit).to_list(length=limit),
+        db.products.aggregate([
+            {"$match": {"seller_id": user_id}},
+            {"$group": {"_id": "$is_sold", "count": {"$sum": 1}}}
+        ]).to_list(length=None)
+    ]
+    if include_archived:
+        archive = db[ARCHIVE_COLLECTION]
+        lookups.append(archive.find(query).sort(SELLER_PRODUCTS_SORT).limit(limit).to_list(length=limit))
+        lookups.append(archive.count_documents({"seller_id": user_id}))
+    user, products, counts, *archived = await asyncio.gather(*lookups)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return User(**user)
+    
+    counts_by_state = {group["_id"]: group["count"] for group in counts}
+    if archived:
+        archived_products, archived_count = archived
+        products = merge_newest_first(products, archived_products, limit=limit)
+        counts_by_state[True] = counts_by_state.get(True, 0) + archived_count
+    return Storefront(
+        user=User(**user),
+        products=[Product(**product) for product in products],
+        next_cursor=encode_product_cursor(products[-1], "created_at") if len(products) == limit else None,
+        active_count=counts_by_state.get(False, 0),
+        sold_count=counts_by_state.get(True, 0)
+    )
 
 @api_router.get("/users/profile/complete")
 async def check_profile_complete(user: User = Depends(get_current_user)):
@@ -442,7 +852,8 @@ async def create_payment_order(user: User = Depends(get_current_user)):
             "payment_capture": 1
         }
         
-        razorpay_order = razorpay_client.order.create(order_data)
+        with timed("payment"), tracing.span("razorpay.order.create"):
+            razorpay_order = get_razorpay_client().order.create(order_data)
         
         # Store payment token in database
         payment_token = PaymentToken(
@@ -460,11 +871,11 @@ async def create_payment_order(user: User = Depends(get_current_user)):
             "order_id": razorpay_order["id"],
             "amount": razorpay_order["amount"],
             "currency": razorpay_order["currency"],
-            "key": os.environ['RAZORPAY_KEY_ID']
+            "key": settings.razorpay_key_id
         }
         
     except Exception as e:
-        logging.error(f"Failed to create Razorpay order: {e}")
+        logger.error("Failed to create Razorpay order: %s", e)
         raise HTTPException(status_code=500, detail="Failed to create payment order")
 
 @api_router.post("/payment/verify")
@@ -476,11 +887,12 @@ async def verify_payment(
     
     try:
         # Verify payment signature
-        razorpay_client.utility.verify_payment_signature({
-            'razorpay_order_id': verification.razorpay_order_id,
-            'razorpay_payment_id': verification.razorpay_payment_id,
-            'razorpay_signature': verification.razorpay_signature
-        })
+        with timed("payment"), tracing.span("razorpay.verify_payment_signature"):
+            get_razorpay_client().utility.verify_payment_signature({
+                'razorpay_order_id': verification.razorpay_order_id,
+                'razorpay_payment_id': verification.razorpay_payment_id,
+                'razorpay_signature': verification.razorpay_signature
+            })
         
         # Update payment token status
         await db.payment_tokens.update_one(
@@ -500,29 +912,25 @@ async def verify_payment(
         return {"status": "success", "message": "Payment verified successfully. You can now upload products!"}
         
     except Exception as e:
-        logging.error(f"Payment verification failed: {e}")
+        logger.error("Payment verification failed: %s", e)
         raise HTTPException(status_code=400, detail="Payment verification failed")
 
 @api_router.get("/payment/tokens")
 async def get_user_payment_tokens(user: User = Depends(get_current_user)):
     """Get user's payment tokens"""
     
-    tokens = await db.payment_tokens.find({
-        "user_id": user.id,
-        "status": "paid",
-        "expires_at": {"$gt": datetime.now(timezone.utc)}
-    }).sort("created_at", -1).to_list(length=None)
+    # Tokens expire a fixed time after creation, so newest-expiry-first is
+    # newest-first, and the sort comes from the same index as the filter
+    tokens = await db.payment_tokens.find(
+        paid_tokens_filter(user.id, datetime.now(timezone.utc))
+    ).sort("expires_at", -1).to_list(length=None)
     
     return [PaymentToken(**token) for token in tokens]
 
 async def check_valid_upload_token(user: User = Depends(get_current_user)):
     """Check if user has a valid upload token"""
     
-    valid_token = await db.payment_tokens.find_one({
-        "user_id": user.id,
-        "status": "paid",
-        "expires_at": {"$gt": datetime.now(timezone.utc)}
-    })
+    valid_token = await db.payment_tokens.find_one(paid_tokens_filter(user.id, datetime.now(timezone.utc)))
     
     if not valid_token:
         raise HTTPException(
@@ -552,30 +960,46 @@ async def create_product(
     if category not in ["Electronics", "Clothes", "Stationery", "Notes"]:
         raise HTTPException(status_code=400, detail="Invalid category")
     
-    # Process images - upload to S3
-    image_urls = []
+    # Reject oversized images before any upload takes an image reference
     for image in images:
         if image.size > 10 * 1024 * 1024:  # 10MB limit
             raise HTTPException(status_code=400, detail=f"Image {image.filename} is too large. Max size is 10MB")
-        
-        content = await image.read()
-        # Upload to S3 and get URL
-        image_url = await upload_image_to_s3(content, image.filename, image.content_type)
-        image_urls.append(image_url)
-    
-    product = Product(
-        title=title,
-        description=description,
-        price=price,
-        category=category,
-        images=image_urls,  # Store S3 URLs instead of base64
-        seller_id=user.id,
-        seller_name=user.name,
-        seller_email=user.email,
-        seller_phone=user.phone  # Include seller phone
-    )
     
-    await db.products.insert_one(product.dict())
+    # Process images - upload to S3. Identical images in one listing are
+    # stored once, matching the one URL the product keeps. The product ID is
+    # fixed up front so each image record can name the product referencing it.
+    product_id = str(uuid.uuid4())
+    image_urls = []
+    seen_keys = set()
+    try:
+        for image in images:
+            content, digest = await read_image_upload(image)
+            key = image_key_for(digest, image.filename)
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
+            image_url = await upload_image_to_s3(content, image.filename, image.content_type, digest, product_id)
+            image_urls.append(image_url)
+        
+        product = Product(
+            id=product_id,
+            title=title,
+            description=description,
+            price=price,
+            category=category,
+            images=image_urls,  # Store S3 URLs instead of base64
+            seller_id=user.id,
+            seller_name=user.name,
+            seller_email=user.email,
+            seller_phone=user.phone  # Include seller phone
+        )
+        
+        await db.products.insert_one(product.dict())
+    except Exception:
+        # No product owns the images: give back the references taken so far
+        await release_image_keys(product_id, product_image_keys({"images": image_urls}, settings.s3_bucket_name))
+        raise
+    await add_to_feed(db, [product.dict()])
     
     # Mark payment token as used
     await db.payment_tokens.update_one(
@@ -583,30 +1007,139 @@ async def create_product(
         {"$set": {"status": "used"}}
     )
     
+    await publish_product_events("created", [product.dict()])
     return product
 
+def encode_product_cursor(product: dict, sort_field: str) -> str:
+    """Encode the last product of a page as an opaque keyset cursor"""
+    value = product[sort_field]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps({"v": value, "id": product["id"]})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_product_cursor(cursor: str, sort_field: str):
+    """Decode a keyset cursor back into (sort value, product id)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        value = payload["v"]
+        if sort_field == "created_at":
+            value = datetime.fromisoformat(value)
+        else:
+            value = float(value)
+        return value, str(payload["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def merge_newest_first(*product_lists: List[dict], limit: Optional[int] = None) -> List[dict]:
+    """Merge lists already sorted by (created_at, id) descending, e.g. live and archived products"""
+    merged = heapq.merge(*product_lists, key=lambda product: (product["created_at"], product["id"]), reverse=True)
+    return list(itertools.islice(merged, limit))
+
+def serialize_json(content) -> bytes:
+    """Render content the way FastAPI's JSONResponse would, once, for sharing"""
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
 @api_router.get("/products", response_model=List[Product])
-async def get_products(category: Optional[str] = None):
-    """Get all products, optionally filtered by category"""
-    query = {"is_sold": False}
-    if category and category in ["Electronics", "Clothes", "Stationery", "Notes"]:
-        query["category"] = category
+async def get_products(
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: str = "newest",
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    cursor: Optional[str] = None
+):
+    """Get all products, optionally filtered by category and price range.
+
+    Supports sorting by newest or price. When ``limit`` is given the results
+    are paginated and the cursor for the next page is returned in the
+    ``X-Next-Cursor`` header. Reads come from the product_feed collection,
+    which only holds unsold listings. Identical concurrent requests share one
+    query and one serialized body.
+    """
+    if sort not in PRODUCT_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort option. Use one of: {', '.join(PRODUCT_SORTS)}")
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot be greater than max_price")
     
-    products = await db.products.find(query).sort("created_at", -1).to_list(length=None)
-    return [Product(**product) for product in products]
+    if category not in ["Electronics", "Clothes", "Stationery", "Notes"]:
+        category = None
+    sort_field, _ = PRODUCT_SORTS[sort]
+    last_position = decode_product_cursor(cursor, sort_field) if cursor else None
+    
+    async def fetch_page():
+        query, sort_spec = product_listing(category, min_price, max_price, sort, last_position)
+        products_cursor = catalog_db[FEED_COLLECTION].find(query, {"_id": 0}).sort(sort_spec)
+        if limit:
+            products_cursor = products_cursor.limit(limit)
+        products = await products_cursor.to_list(length=limit)
+        
+        next_cursor = encode_product_cursor(products[-1], sort_field) if limit and len(products) == limit else None
+        return serialize_json([Product(**product) for product in products]), next_cursor
+    
+    # Key on the validated parameters so equivalent query strings coalesce
+    key = (category, min_price, max_price, sort, limit, cursor)
+    body, next_cursor = await product_list_flight.do(key, fetch_page)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/products/stream")
+async def stream_products(request: Request, category: Optional[str] = None):
+    """Stream product created/sold/deleted events as Server-Sent Events"""
+    if category and category not in ["Electronics", "Clothes", "Stationery", "Notes"]:
+        raise HTTPException(status_code=400, detail="Invalid category")
+    
+    subscriber = product_events.subscribe(category or None)
+    
+    async def event_stream():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if event is None:
+                    # Dropped for falling behind, or shutting down; the client reconnects
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            product_events.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.get("/products/{product_id}", response_model=Product)
 async def get_product(product_id: str):
-    """Get product by ID"""
-    product = await db.products.find_one({"id": product_id})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return Product(**product)
+    """Get product by ID. Identical concurrent requests share one lookup."""
+    async def fetch_product():
+        product = await catalog_db.products.find_one({"id": product_id})
+        if not product:
+            # A secondary may not have a just-created product yet; confirm on the primary
+            product = await db.products.find_one({"id": product_id})
+        if not product:
+            # Long-sold products live in the archive; only misses pay for this lookup
+            product = await catalog_db[ARCHIVE_COLLECTION].find_one({"id": product_id})
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return serialize_json(Product(**product))
+    
+    body = await product_detail_flight.do(product_id, fetch_product)
+    return Response(content=body, media_type="application/json")
 
 @api_router.get("/products/user/{user_id}", response_model=List[Product])
-async def get_user_products(user_id: str):
-    """Get all products by a specific user"""
-    products = await db.products.find({"seller_id": user_id}).sort("created_at", -1).to_list(length=None)
+async def get_user_products(user_id: str, include_archived: bool = False):
+    """Get all products by a specific user, optionally including archived sold ones"""
+    products = await db.products.find({"seller_id": user_id}).sort(SELLER_PRODUCTS_SORT).to_list(length=None)
+    if include_archived:
+        archived = await db[ARCHIVE_COLLECTION].find({"seller_id": user_id}).sort(SELLER_PRODUCTS_SORT).to_list(length=None)
+        products = merge_newest_first(products, archived)
     return [Product(**product) for product in products]
 
 @api_router.put("/products/{product_id}/sold")
@@ -624,45 +1157,370 @@ async def mark_product_sold(
     
     await db.products.update_one(
         {"id": product_id},
-        {"$set": {"is_sold": True}}
+        {"$set": {"is_sold": True, "sold_at": datetime.now(timezone.utc)}}
     )
+    await remove_from_feed(db, [product_id])
     
+    await publish_product_events("sold", [product])
     return {"message": "Product marked as sold"}
 
+async def queue_product_image_cleanup(products: List[dict]):
+    """Queue removal of the S3 objects owned by deleted products, one job per product"""
+    for product in products:
+        keys = product_image_keys(product, settings.s3_bucket_name)
+        if keys:
+            await background_queue.submit("release_product_images", release_image_keys, product["id"], keys)
+
 @api_router.delete("/products/{product_id}")
 async def delete_product(
     product_id: str,
     user: User = Depends(get_current_user)
 ):
     """Delete a product"""
-    product = await db.products.find_one({"id": product_id})
+    collection = db.products
+    product = await collection.find_one({"id": product_id})
+    if not product:
+        # Archived sold listings still show on the seller's profile
+        collection = db[ARCHIVE_COLLECTION]
+        product = await collection.find_one({"id": product_id})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if product["seller_id"] != user.id:
         raise HTTPException(status_code=403, detail="Not authorized to delete this product")
     
-    await db.products.delete_one({"id": product_id})
+    await collection.delete_one({"id": product_id})
+    await remove_from_feed(db, [product_id])
+    await publish_product_events("deleted", [product])
+    await queue_product_image_cleanup([product])
     return {"message": "Product deleted successfully"}
 
-# Include the router in the main app
-app.include_router(api_router)
+def classify_bulk_products(product_ids: List[str], found: List[dict], user_id: str):
+    """Split requested IDs into ones the user owns and per-ID failure results"""
+    by_id = {product["id"]: product for product in found}
+    owned, results = [], {}
+    for product_id in product_ids:
+        product = by_id.get(product_id)
+        if not product:
+            results[product_id] = "not_found"
+        elif product["seller_id"] != user_id:
+            results[product_id] = "forbidden"
+        else:
+            owned.append(product_id)
+    return owned, results
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@api_router.post("/products/bulk/sold")
+async def bulk_mark_products_sold(
+    payload: BulkProductIds,
+    user: User = Depends(get_current_user)
+):
+    """Mark several products as sold in one request"""
+    product_ids = list(dict.fromkeys(payload.product_ids))
+    found = await db.products.find(
+        {"id": {"$in": product_ids}},
+        {"_id": 0, "id": 1, "seller_id": 1, "is_sold": 1, "category": 1}
+    ).to_list(length=None)
+    owned, results = classify_bulk_products(product_ids, found, user.id)
+    
+    already_sold = {product["id"] for product in found if product.get("is_sold")}
+    for product_id in owned:
+        results[product_id] = "already_sold" if product_id in already_sold else "sold"
+    
+    to_update = [product_id for product_id in owned if product_id not in already_sold]
+    updated = 0
+    if to_update:
+        result = await db.products.update_many(
+            {"id": {"$in": to_update}, "seller_id": user.id, "is_sold": False},
+            {"$set": {"is_sold": True, "sold_at": datetime.now(timezone.utc)}}
+        )
+        updated = result.modified_count
+        await remove_from_feed(db, to_update)
+        await publish_product_events("sold", [product for product in found if product["id"] in to_update])
+    
+    return {
+        "updated": updated,
+        "results": [{"id": product_id, "status": results[product_id]} for product_id in product_ids]
+    }
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+@api_router.post("/products/bulk/delete")
+async def bulk_delete_products(
+    payload: BulkProductIds,
+    user: User = Depends(get_current_user)
+):
+    """Delete several products in one request, archived sold ones included"""
+    product_ids = list(dict.fromkeys(payload.product_ids))
+    projection = {"_id": 0, "id": 1, "seller_id": 1, "category": 1, "images": 1, "image_variants": 1}
+    found = await db.products.find({"id": {"$in": product_ids}}, projection).to_list(length=None)
+    live_ids = {product["id"] for product in found}
+    missing = [product_id for product_id in product_ids if product_id not in live_ids]
+    if missing:
+        found += await db[ARCHIVE_COLLECTION].find({"id": {"$in": missing}}, projection).to_list(length=None)
+    owned, results = classify_bulk_products(product_ids, found, user.id)
+    
+    deleted = 0
+    if owned:
+        for collection in (db.products, db[ARCHIVE_COLLECTION]):
+            result = await collection.delete_many({"id": {"$in": owned}, "seller_id": user.id})
+            deleted += result.deleted_count
+        await remove_from_feed(db, owned)
+        for product_id in owned:
+            results[product_id] = "deleted"
+        deleted_products = [product for product in found if product["id"] in owned]
+        await publish_product_events("deleted", deleted_products)
+        await queue_product_image_cleanup(deleted_products)
+    
+    return {
+        "deleted": deleted,
+        "results": [{"id": product_id, "status": results[product_id]} for product_id in product_ids]
+    }
+
+@api_router.post("/products/bulk/import")
+async def bulk_import_products(
+    request: Request,
+    user: User = Depends(get_current_user)
+):
+    """Import listings from an NDJSON body (one product object per line).
+
+    Each listing consumes one paid upload token, claimed atomically before
+    the insert so concurrent imports cannot spend the same token. Lines that
+    fail validation or have no token left are reported individually; valid
+    lines are inserted with a single unordered insert_many, and the tokens of
+    lines whose insert failed are given back.
+    """
+    if not user.phone or user.phone.strip() == "":
+        raise HTTPException(status_code=400, detail="Please complete your profile with phone number before creating products")
+    
+    body = (await request.body()).decode("utf-8", errors="replace")
+    lines = [(number, line) for number, line in enumerate(body.splitlines(), start=1) if line.strip()]
+    if not lines:
+        raise HTTPException(status_code=400, detail="Request body must contain at least one NDJSON line")
+    if len(lines) > MAX_BULK_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_PRODUCTS} listings can be imported at once")
+    
+    results = {}
+    documents = []
+    for number, line in lines:
+        try:
+            listing = ProductCreate(**json.loads(line))
+        except Exception as e:
+            results[number] = {"line": number, "status": "error", "detail": f"Invalid listing: {e}"}
+            continue
+        if listing.category not in ["Electronics", "Clothes", "Stationery", "Notes"]:
+            results[number] = {"line": number, "status": "error", "detail": "Invalid category"}
+            continue
+        product = Product(
+            title=listing.title,
+            description=listing.description,
+            price=listing.price,
+            category=listing.category,
+            images=[],
+            seller_id=user.id,
+            seller_name=user.name,
+            seller_email=user.email,
+            seller_phone=user.phone
+        )
+        documents.append((number, product.dict()))
+    
+    # Claim one token per valid listing, soonest-expiring first
+    now = datetime.now(timezone.utc)
+    token_ids = []
+    for _ in documents:
+        token = await db.payment_tokens.find_one_and_update(
+            paid_tokens_filter(user.id, now),
+            {"$set": {"status": "used"}},
+            projection={"_id": 1},
+            sort=[("expires_at", 1)]
+        )
+        if token is None:
+            break
+        token_ids.append(token["_id"])
+    for number, _ in documents[len(token_ids):]:
+        results[number] = {"line": number, "status": "error", "detail": "Payment required. Please pay ₹20 to upload products."}
+    documents = documents[:len(token_ids)]
+    
+    failed_indexes = set()
+    if documents:
+        try:
+            await db.products.insert_many([doc for _, doc in documents], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                failed_indexes.add(error["index"])
+                number = documents[error["index"]][0]
+                results[number] = {"line": number, "status": "error", "detail": error.get("errmsg", "Insert failed")}
+        except Exception:
+            await db.payment_tokens.update_many(
+                {"_id": {"$in": token_ids}, "status": "used"},
+                {"$set": {"status": "paid"}}
+            )
+            raise
+    
+    inserted = [(number, doc) for index, (number, doc) in enumerate(documents) if index not in failed_indexes]
+    for number, doc in inserted:
+        results[number] = {"line": number, "status": "created", "id": doc["id"]}
+    
+    # Give back the tokens claimed for listings that were not inserted
+    if failed_indexes:
+        await db.payment_tokens.update_many(
+            {"_id": {"$in": [token_ids[index] for index in failed_indexes]}, "status": "used"},
+            {"$set": {"status": "paid"}}
+        )
+    if inserted:
+        await add_to_feed(db, [doc for _, doc in inserted])
+        await publish_product_events("created", [doc for _, doc in inserted])
+    
+    return {
+        "created": len(inserted),
+        "results": [results[number] for number, _ in lines]
+    }
+
+# Health routes
+READINESS_MONGO_TIMEOUT = 2.0
+# dependency name -> (checked_at, result) for the optional external checks
+external_check_cache = {}
+
+def check_s3_reachable():
+    get_s3_client().head_bucket(Bucket=settings.s3_bucket_name)
+
+async def check_razorpay_reachable():
+    # Any HTTP response means the API is reachable; only transport errors fail
+    await http_client.get("https://api.razorpay.com/v1/", timeout=3.0)
+
+async def cached_external_check(name: str, check) -> dict:
+    """Run an external reachability check at most once per readiness TTL"""
+    now = time.monotonic()
+    cached = external_check_cache.get(name)
+    if cached and now - cached[0] < settings.readiness_external_ttl:
+        return cached[1]
+    started = time.perf_counter()
+    try:
+        await check()
+        result = {"ok": True}
+    except Exception as e:
+        result = {"ok": False, "error": type(e).__name__}
+    result["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    external_check_cache[name] = (now, result)
+    return result
+
+@api_router.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@api_router.get("/readyz")
+async def readyz():
+    """Readiness: Mongo answers a ping, plus optional cached S3/Razorpay checks"""
+    checks = {}
+    ready = not shutting_down
+    
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout=READINESS_MONGO_TIMEOUT)
+        checks["mongo"] = {"ok": True}
+    except Exception as e:
+        checks["mongo"] = {"ok": False, "error": type(e).__name__}
+        ready = False
+    checks["mongo"]["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    checks["mongo"]["pool"] = pool_stats.snapshot()
+    
+    if settings.readiness_check_external:
+        checks["s3"] = await cached_external_check("s3", lambda: asyncio.to_thread(check_s3_reachable))
+        checks["razorpay"] = await cached_external_check("razorpay", check_razorpay_reachable)
+        ready = ready and checks["s3"]["ok"] and checks["razorpay"]["ok"]
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else ("draining" if shutting_down else "unavailable"), "checks": checks}
+    )
+
+# Metrics routes
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose in-process metrics in Prometheus text format"""
+    return metrics.REGISTRY.render()
+
+async def create_indexes():
+    """Create the collection indexes (see indexes.py) and the helpers' own"""
+    await create_collection_indexes(db)
+    await rate_limit_backend.setup()
+    if session_manager is not None:
+        await session_manager.setup()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app_settings = app.state.settings
+    # Log records are handed to a listener thread so handler I/O never blocks the loop
+    log_listener = configure_logging(app_settings.log_level)
+    app_settings.validate()
+    tracing.configure_tracing(app_settings)
+    init_resources(app_settings)
+    
+    # Open the minimum pool connections now rather than on the first request
+    await db.command("ping")
+    await create_indexes()
+    if await feed_needs_build(db):
+        logger.info("Building %s from products", FEED_COLLECTION)
+        await rebuild_feed(db)
+    if session_manager is not None:
+        await session_manager.start()
+    background_queue.start()
+    s3_image_deleter.start()
+    product_archiver.start()
+    await product_events.start()
+    
+    yield
+    
+    global shutting_down
+    shutting_down = True
+    # Drain queued jobs while the Mongo client is still open
+    await product_archiver.stop()
+    await background_queue.stop(timeout=settings.background_drain_timeout)
+    await s3_image_deleter.stop()
+    await product_events.stop()
+    if session_manager is not None:
+        await session_manager.stop()
+    await http_client.aclose()
+    client.close()
+    shared_cache.close()
+    tracing.shutdown_tracing()
+    log_listener.stop()
+
+def create_app(app_settings: Optional[Settings] = None) -> FastAPI:
+    """Build the FastAPI app. Clients are created by the lifespan, not here."""
+    app_settings = app_settings or Settings.from_env()
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = app_settings
+    
+    # Include the router in the main app
+    app.include_router(api_router)
+    
+    app.add_middleware(
+        RateLimitMiddleware,
+        policies=load_policies(app_settings.rate_limits),
+        backend=lambda: rate_limit_backend,
+        trust_proxy=app_settings.rate_limit_trust_proxy,
+        trusted_proxies=app_settings.rate_limit_trusted_proxies,
+    )
+    
+    app.add_middleware(
+        AccessLogMiddleware,
+        sample_rate=app_settings.access_log_sample_rate,
+        slow_ms=app_settings.access_log_slow_ms,
+        skip_paths=("/api/healthz", "/api/readyz"),
+        server_timing=app_settings.server_timing,
+    )
+    
+    # Outside the access log so the request span covers the whole request
+    app.add_middleware(tracing.TracingMiddleware)
+    
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=app_settings.cors_origins,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Retry-After", "X-Request-ID", "Server-Timing"],
+    )
+    
+    return app
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+app = create_app(settings)
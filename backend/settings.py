@@ -0,0 +1,158 @@
+"""Runtime configuration for the API, read from the environment.
+
+``Settings.from_env()`` never fails on a missing variable, so the app can be
+imported (and built with ``create_app``) without any secrets present.
+Variables the running service cannot do without are checked by ``validate``
+when the app starts up.
+"""
+import ipaddress
+import os
+from dataclasses import dataclass, field, fields
+from typing import List, Optional
+
+
+def _env_list(name: str, default: str) -> List[str]:
+    return [item.strip() for item in os.environ.get(name, default).split(",") if item.strip()]
+
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes")
+
+
+@dataclass
+class Settings:
+    # MongoDB
+    mongo_url: str = ""
+    db_name: str = ""
+    mongo_min_pool_size: int = 5
+    mongo_max_pool_size: int = 100
+    # Max replication lag (seconds, >= 90) for catalog reads served by secondaries
+    catalog_max_staleness: int = 90
+
+    cors_origins: List[str] = field(default_factory=lambda: ["*"])
+
+    # AWS S3
+    aws_access_key_id: str = ""
+    aws_secret_access_key: str = ""
+    aws_region: str = ""
+    s3_bucket_name: str = ""
+
+    # Razorpay
+    razorpay_key_id: str = ""
+    razorpay_key_secret: str = ""
+
+    # Sessions: "opaque" (random token looked up in Mongo) or "signed" (HMAC
+    # JWT verified in-process; revocations synced every session_sync_interval)
+    session_mode: str = "opaque"
+    jwt_secret: str = ""
+    session_sync_interval: float = 30.0
+
+    # Rate limiting
+    rate_limit_backend: str = "memory"
+    rate_limits: Optional[str] = None
+    rate_limit_trust_proxy: bool = False
+    # Peers (CIDRs) whose X-Real-IP/X-Forwarded-For is believed; empty trusts any peer
+    rate_limit_trusted_proxies: List[str] = field(default_factory=list)
+
+    # Shared session/user cache
+    shared_cache_name: str = "thaparmart_cache"
+    shared_cache_slots: int = 8192
+    shared_cache_ttl: float = 60.0
+
+    # Background jobs
+    background_queue_size: int = 1000
+    background_workers: int = 4
+    background_job_retries: int = 3
+    background_drain_timeout: float = 10.0
+
+    # Live product events
+    product_events_fanout: str = "local"
+    product_events_buffer: int = 100
+
+    # Archival of long-sold products (archive_interval 0 disables the in-process job)
+    archive_after_days: float = 90.0
+    archive_batch_size: int = 500
+    archive_interval: float = 3600.0
+
+    # Readiness probe: also check S3/Razorpay reachability (results cached)
+    readiness_check_external: bool = False
+    readiness_external_ttl: float = 30.0
+
+    # Logging
+    log_level: str = "INFO"
+    access_log_sample_rate: float = 0.1
+    access_log_slow_ms: float = 1000.0
+    # Mongo commands at least this slow are logged with their route
+    mongo_slow_command_ms: float = 100.0
+    # Send a Server-Timing header (db, s3, payment, total) on every response
+    server_timing: bool = True
+
+    # Tracing: "" (off), "otlp" or "file"; needs requirements-tracing.txt
+    tracing_exporter: str = ""
+    tracing_sample_ratio: float = 0.05
+    tracing_otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_file: str = "traces.jsonl"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        defaults = cls()
+        return cls(
+            mongo_url=os.environ.get("MONGO_URL", ""),
+            db_name=os.environ.get("DB_NAME", ""),
+            mongo_min_pool_size=int(os.environ.get("MONGO_MIN_POOL_SIZE", defaults.mongo_min_pool_size)),
+            mongo_max_pool_size=int(os.environ.get("MONGO_MAX_POOL_SIZE", defaults.mongo_max_pool_size)),
+            catalog_max_staleness=int(os.environ.get("CATALOG_MAX_STALENESS", defaults.catalog_max_staleness)),
+            cors_origins=_env_list("CORS_ORIGINS", "*"),
+            aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", ""),
+            aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", ""),
+            aws_region=os.environ.get("AWS_REGION", ""),
+            s3_bucket_name=os.environ.get("S3_BUCKET_NAME", ""),
+            razorpay_key_id=os.environ.get("RAZORPAY_KEY_ID", ""),
+            razorpay_key_secret=os.environ.get("RAZORPAY_KEY_SECRET", ""),
+            session_mode=os.environ.get("SESSION_MODE", defaults.session_mode),
+            jwt_secret=os.environ.get("JWT_SECRET", ""),
+            session_sync_interval=float(os.environ.get("SESSION_SYNC_INTERVAL", defaults.session_sync_interval)),
+            rate_limit_backend=os.environ.get("RATE_LIMIT_BACKEND", defaults.rate_limit_backend),
+            rate_limits=os.environ.get("RATE_LIMITS"),
+            rate_limit_trust_proxy=_env_bool("RATE_LIMIT_TRUST_PROXY"),
+            rate_limit_trusted_proxies=_env_list("RATE_LIMIT_TRUSTED_PROXIES", ""),
+            shared_cache_name=os.environ.get("SHARED_CACHE_NAME", defaults.shared_cache_name),
+            shared_cache_slots=int(os.environ.get("SHARED_CACHE_SLOTS", defaults.shared_cache_slots)),
+            shared_cache_ttl=float(os.environ.get("SHARED_CACHE_TTL", defaults.shared_cache_ttl)),
+            background_queue_size=int(os.environ.get("BACKGROUND_QUEUE_SIZE", defaults.background_queue_size)),
+            background_workers=int(os.environ.get("BACKGROUND_WORKERS", defaults.background_workers)),
+            background_job_retries=int(os.environ.get("BACKGROUND_JOB_RETRIES", defaults.background_job_retries)),
+            background_drain_timeout=float(os.environ.get("BACKGROUND_DRAIN_TIMEOUT", defaults.background_drain_timeout)),
+            product_events_fanout=os.environ.get("PRODUCT_EVENTS_FANOUT", defaults.product_events_fanout),
+            product_events_buffer=int(os.environ.get("PRODUCT_EVENTS_BUFFER", defaults.product_events_buffer)),
+            archive_after_days=float(os.environ.get("ARCHIVE_AFTER_DAYS", defaults.archive_after_days)),
+            archive_batch_size=int(os.environ.get("ARCHIVE_BATCH_SIZE", defaults.archive_batch_size)),
+            archive_interval=float(os.environ.get("ARCHIVE_INTERVAL", defaults.archive_interval)),
+            readiness_check_external=_env_bool("READINESS_CHECK_EXTERNAL"),
+            readiness_external_ttl=float(os.environ.get("READINESS_EXTERNAL_TTL", defaults.readiness_external_ttl)),
+            log_level=os.environ.get("LOG_LEVEL", defaults.log_level),
+            access_log_sample_rate=float(os.environ.get("ACCESS_LOG_SAMPLE_RATE", defaults.access_log_sample_rate)),
+            access_log_slow_ms=float(os.environ.get("ACCESS_LOG_SLOW_MS", defaults.access_log_slow_ms)),
+            mongo_slow_command_ms=float(os.environ.get("MONGO_SLOW_COMMAND_MS", defaults.mongo_slow_command_ms)),
+            server_timing=_env_bool("SERVER_TIMING", defaults.server_timing),
+            tracing_exporter=os.environ.get("TRACING_EXPORTER", defaults.tracing_exporter),
+            tracing_sample_ratio=float(os.environ.get("TRACING_SAMPLE_RATIO", defaults.tracing_sample_ratio)),
+            tracing_otlp_endpoint=os.environ.get("TRACING_OTLP_ENDPOINT", defaults.tracing_otlp_endpoint),
+            tracing_file=os.environ.get("TRACING_FILE", defaults.tracing_file),
+        )
+
+    def validate(self):
+        """Raise if settings the service needs at runtime are missing"""
+        required = ("mongo_url", "db_name")
+        missing = [f.name.upper() for f in fields(self) if f.name in required and not getattr(self, f.name)]
+        if self.session_mode == "signed" and not self.jwt_secret:
+            missing.append("JWT_SECRET")
+        if missing:
+            raise RuntimeError(f"Missing required settings: {', '.join(missing)}")
+        for network in self.rate_limit_trusted_proxies:
+            try:
+                ipaddress.ip_network(network, strict=False)
+            except ValueError:
+                raise RuntimeError(f"RATE_LIMIT_TRUSTED_PROXIES has an invalid network: {network!r}")
+        if self.tracing_exporter not in ("", "otlp", "file"):
+            raise RuntimeError(f"TRACING_EXPORTER must be otlp or file, not {self.tracing_exporter!r}")
@@ -0,0 +1,201 @@
+"""Cross-worker cache for hot session and user lookups.
+
+All uvicorn workers on a host attach to one ``multiprocessing.shared_memory``
+segment that is laid out as a fixed-size open-addressed hash table::
+
+    header: magic (8s) | generation (Q) | slots (Q) | slot_size (Q)
+    slot:   seq (Q) | key_hash (Q) | generation (Q) | expires_at (d) | length (I) | payload
+
+Reads are lock-free: every slot carries a sequence counter that writers make
+odd while they modify the slot (a seqlock), so a reader that sees an odd or
+changed counter treats the lookup as a miss. Writers from different processes
+serialise on ``fcntl`` byte-range locks over a small set of stripes.
+Bumping the header generation invalidates every entry at once.
+"""
+import fcntl
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from hashlib import blake2b
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Optional
+
+import metrics
+
+CACHE_REQUESTS = metrics.counter(
+    "shared_cache_requests_total",
+    "Shared cache lookups by namespace and result",
+)
+
+MAGIC = b"TMCACHE1"
+HEADER = struct.Struct("<8sQQQ")
+SLOT_HEADER = struct.Struct("<QQQdI")
+SEQ = struct.Struct("<Q")
+PROBE_LENGTH = 4
+LOCK_STRIPES = 64
+
+logger = logging.getLogger(__name__)
+
+
+def _key_hash(key: str) -> int:
+    # 0 marks an empty slot, so never hand it out as a hash
+    return int.from_bytes(blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class SharedSlotCache:
+    """Fixed-slot hash table in shared memory with seqlock-protected slots"""
+
+    def __init__(self, name: str, slots: int = 8192, slot_size: int = 2048):
+        self.name = name
+        self.slots = slots
+        self.slot_size = slot_size
+        self.payload_size = slot_size - SLOT_HEADER.size
+        self._shm = None
+        self._lock_file = None
+
+        size = HEADER.size + slots * slot_size
+        try:
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                HEADER.pack_into(self._shm.buf, 0, MAGIC, 1, slots, slot_size)
+            except FileExistsError:
+                self._shm = shared_memory.SharedMemory(name=name)
+            # The segment outlives whichever worker created it; stop the
+            # resource tracker from unlinking it when that worker exits.
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+
+            # Another worker may have created the segment but not yet written its header
+            for _ in range(20):
+                magic, _, existing_slots, existing_slot_size = HEADER.unpack_from(self._shm.buf, 0)
+                if magic != bytes(len(MAGIC)):
+                    break
+                time.sleep(0.05)
+            if magic != MAGIC or existing_slots != slots or existing_slot_size != slot_size:
+                raise ValueError("shared cache segment has an incompatible layout")
+
+            lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+            self._lock_file = open(lock_path, "a+b")
+        except Exception as e:
+            logger.warning("Shared cache %s disabled: %s", name, e)
+            self.close()
+
+    @property
+    def enabled(self) -> bool:
+        return self._shm is not None
+
+    def _generation(self) -> int:
+        return struct.unpack_from("<Q", self._shm.buf, 8)[0]
+
+    def _offset(self, index: int) -> int:
+        return HEADER.size + index * self.slot_size
+
+    def _read_slot(self, index: int, key_hash: int):
+        """Read one slot without locking; returns the payload or None"""
+        buf = self._shm.buf
+        offset = self._offset(index)
+        seq_before = SEQ.unpack_from(buf, offset)[0]
+        if seq_before & 1:
+            return None
+        _, slot_hash, generation, expires_at, length = SLOT_HEADER.unpack_from(buf, offset)
+        if slot_hash != key_hash or length > self.payload_size:
+            return None
+        start = offset + SLOT_HEADER.size
+        payload = bytes(buf[start:start + length])
+        if SEQ.unpack_from(buf, offset)[0] != seq_before:
+            return None
+        return generation, expires_at, payload
+
+    def get(self, key: str) -> Optional[Any]:
+        namespace = key.split(":", 1)[0]
+        if not self.enabled:
+            return None
+        key_hash = _key_hash(key)
+        generation = self._generation()
+        now = time.time()
+        for probe in range(PROBE_LENGTH):
+            slot = self._read_slot((key_hash + probe) % self.slots, key_hash)
+            if slot is None:
+                continue
+            slot_generation, expires_at, payload = slot
+            if slot_generation != generation or expires_at <= now:
+                break
+            try:
+                stored_key, value = json.loads(payload)
+            except ValueError:
+                break
+            if stored_key == key:
+                CACHE_REQUESTS.inc(namespace=namespace, result="hit")
+                return value
+        CACHE_REQUESTS.inc(namespace=namespace, result="miss")
+        return None
+
+    def _write_slot(self, index: int, key_hash: int, generation: int, expires_at: float, payload: bytes):
+        buf = self._shm.buf
+        offset = self._offset(index)
+        stripe = index % LOCK_STRIPES
+        fcntl.lockf(self._lock_file, fcntl.LOCK_EX, 1, stripe)
+        try:
+            seq = SEQ.unpack_from(buf, offset)[0]
+            SEQ.pack_into(buf, offset, seq + 1)
+            SLOT_HEADER.pack_into(buf, offset, seq + 1, key_hash, generation, expires_at, len(payload))
+            start = offset + SLOT_HEADER.size
+            buf[start:start + len(payload)] = payload
+            SEQ.pack_into(buf, offset, seq + 2)
+        finally:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_UN, 1, stripe)
+
+    def _pick_slot(self, key_hash: int, generation: int) -> int:
+        """Choose the slot for a key: its current slot, else a free or stale one"""
+        now = time.time()
+        first = key_hash % self.slots
+        fallback = None
+        for probe in range(PROBE_LENGTH):
+            index = (first + probe) % self.slots
+            _, slot_hash, slot_generation, expires_at, _ = SLOT_HEADER.unpack_from(self._shm.buf, self._offset(index))
+            if slot_hash == key_hash:
+                return index
+            if fallback is None and (slot_hash == 0 or slot_generation != generation or expires_at <= now):
+                fallback = index
+        return first if fallback is None else fallback
+
+    def set(self, key: str, value: Any, ttl: float) -> bool:
+        if not self.enabled or ttl <= 0:
+            return False
+        payload = json.dumps([key, value], separators=(",", ":"), default=str).encode("utf-8")
+        if len(payload) > self.payload_size:
+            return False
+        key_hash = _key_hash(key)
+        generation = self._generation()
+        index = self._pick_slot(key_hash, generation)
+        self._write_slot(index, key_hash, generation, time.time() + ttl, payload)
+        return True
+
+    def delete(self, key: str):
+        if not self.enabled:
+            return
+        key_hash = _key_hash(key)
+        for probe in range(PROBE_LENGTH):
+            index = (key_hash + probe) % self.slots
+            if SLOT_HEADER.unpack_from(self._shm.buf, self._offset(index))[1] == key_hash:
+                self._write_slot(index, 0, 0, 0.0, b"")
+
+    def clear(self):
+        """Invalidate every entry by bumping the segment generation"""
+        if not self.enabled:
+            return
+        fcntl.lockf(self._lock_file, fcntl.LOCK_EX, 1, LOCK_STRIPES)
+        try:
+            struct.pack_into("<Q", self._shm.buf, 8, self._generation() + 1)
+        finally:
+            fcntl.lockf(self._lock_file, fcntl.LOCK_UN, 1, LOCK_STRIPES)
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
@@ -0,0 +1,159 @@
+"""Stateless session tokens: HMAC-signed JWTs verified without a DB read.
+
+A token carries the user id (``sub``), a token id (``jti``), its expiry and
+the user's session generation (``gen``) at login. Verification checks the
+signature and expiry in-process, then two in-memory revocation structures:
+
+* a denylist of token ids revoked by logout, kept only until each token
+  would have expired anyway;
+* the current session generation per user; ``revoke_all`` bumps it, which
+  invalidates every token issued before.
+
+Both live in Mongo (``session_revocations`` and ``users.session_generation``)
+and every worker pulls changes every ``sync_interval`` seconds, so a
+revocation made in one worker takes effect everywhere within that window
+(immediately in the worker that made it).
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+import jwt
+import pymongo
+
+import metrics
+
+ALGORITHM = "HS256"
+
+VERIFICATIONS = metrics.counter(
+    "signed_session_verifications_total",
+    "Signed session token checks by outcome",
+)
+DENYLIST_SIZE = metrics.gauge(
+    "signed_session_denylist_size",
+    "Revoked, not yet expired session tokens held in memory",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class SignedSessionManager:
+    def __init__(self, db, secret: str, ttl: timedelta = timedelta(days=7), sync_interval: float = 30.0):
+        self.revocations = db.session_revocations
+        self.users = db.users
+        self.secret = secret
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._denylist: Dict[str, float] = {}  # jti -> token expiry (epoch seconds)
+        self._generations: Dict[str, int] = {}  # user id -> current generation, when above 0
+        self._synced_at: Optional[datetime] = None
+        self._syncer: Optional[asyncio.Task] = None
+
+    def issue(self, user_id: str, generation: int = 0) -> Tuple[str, datetime]:
+        now = datetime.now(timezone.utc)
+        expires_at = now + self.ttl
+        claims = {"sub": user_id, "jti": uuid.uuid4().hex, "gen": generation, "iat": now, "exp": expires_at}
+        return jwt.encode(claims, self.secret, algorithm=ALGORITHM), expires_at
+
+    def decode(self, token: str) -> Optional[dict]:
+        """Return the claims of a validly signed, unexpired token, else None"""
+        try:
+            return jwt.decode(token, self.secret, algorithms=[ALGORITHM], options={"require": ["sub", "jti", "exp"]})
+        except jwt.PyJWTError:
+            return None
+
+    def verify(self, token: str) -> Optional[str]:
+        """Return the user id for a token that is valid and not revoked"""
+        claims = self.decode(token)
+        if claims is None:
+            outcome = "invalid"
+        elif claims["jti"] in self._denylist:
+            outcome = "revoked"
+        elif claims.get("gen", 0) < self._generations.get(claims["sub"], 0):
+            outcome = "superseded"
+        else:
+            VERIFICATIONS.inc(outcome="valid")
+            return claims["sub"]
+        VERIFICATIONS.inc(outcome=outcome)
+        return None
+
+    async def revoke(self, claims: dict):
+        """Revoke one token (logout)"""
+        expires_at = datetime.fromtimestamp(claims["exp"], timezone.utc)
+        self._denylist[claims["jti"]] = expires_at.timestamp()
+        DENYLIST_SIZE.set(len(self._denylist))
+        await self.revocations.update_one(
+            {"jti": claims["jti"]},
+            {"$set": {"user_id": claims["sub"], "expires_at": expires_at, "revoked_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    async def revoke_all(self, user_id: str) -> int:
+        """Invalidate every token issued to a user so far; returns the new generation"""
+        user = await self.users.find_one_and_update(
+            {"id": user_id},
+            {"$inc": {"session_generation": 1}, "$set": {"session_generation_at": datetime.now(timezone.utc)}},
+            projection={"_id": 0, "session_generation": 1},
+            return_document=pymongo.ReturnDocument.AFTER
+        )
+        generation = user["session_generation"] if user else 0
+        self._generations[user_id] = generation
+        return generation
+
+    async def sync(self):
+        """Pull revocations and generation bumps made since the last sync"""
+        started = datetime.now(timezone.utc)
+        revoked_query, generation_query = {}, {"session_generation": {"$gt": 0}}
+        if self._synced_at is not None:
+            # Overlap by one interval so writes from slightly skewed clocks are not missed
+            since = self._synced_at - timedelta(seconds=self.sync_interval)
+            revoked_query = {"revoked_at": {"$gte": since}}
+            generation_query = {"session_generation_at": {"$gte": since}}
+
+        async for revocation in self.revocations.find(revoked_query, {"_id": 0, "jti": 1, "expires_at": 1}):
+            self._denylist[revocation["jti"]] = _epoch(revocation["expires_at"])
+        async for user in self.users.find(generation_query, {"_id": 0, "id": 1, "session_generation": 1}):
+            self._generations[user["id"]] = max(self._generations.get(user["id"], 0), user["session_generation"])
+
+        # Entries for tokens that have expired can never match again
+        now = started.timestamp()
+        self._denylist = {jti: expiry for jti, expiry in self._denylist.items() if expiry > now}
+        DENYLIST_SIZE.set(len(self._denylist))
+        self._synced_at = started
+
+    async def setup(self):
+        await self.revocations.create_indexes([
+            pymongo.IndexModel([("jti", 1)], name="revocation_jti", unique=True),
+            pymongo.IndexModel([("revoked_at", 1)], name="revocation_time"),
+            pymongo.IndexModel([("expires_at", 1)], name="revocation_ttl", expireAfterSeconds=0),
+        ])
+        await self.users.create_index(
+            "session_generation_at", name="user_session_generation", sparse=True
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Session revocation sync failed")
+
+    async def start(self):
+        await self.sync()
+        if self._syncer is None:
+            self._syncer = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._syncer is not None:
+            self._syncer.cancel()
+            await asyncio.gather(self._syncer, return_exceptions=True)
+            self._syncer = None
@@ -0,0 +1,71 @@
+"""Collapse concurrent identical reads into a single backend fetch.
+
+``SingleFlight.do(key, func)`` runs ``func()`` once per key while a call for
+that key is in flight; every caller that arrives meanwhile awaits the same
+result (or exception). Nothing is cached: once the call finishes the key is
+forgotten and the next caller starts a fresh fetch.
+
+The fetch runs in its own task, so a caller that is cancelled (a client
+disconnecting) never cancels the fetch other callers are waiting on. Only
+when every waiter has gone is the fetch itself cancelled.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+import metrics
+
+REQUESTS = metrics.counter(
+    "single_flight_requests_total",
+    "Coalesced reads by route and whether they started the fetch or shared one",
+)
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, name: str = "default"):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.create_task(func()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finished(key, call))
+            REQUESTS.inc(route=self.name, outcome="leader")
+        else:
+            REQUESTS.inc(route=self.name, outcome="shared")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            # The last waiter to leave takes the unfinished fetch with it. The
+            # key is dropped now rather than in the done callback, so a caller
+            # arriving before the task unwinds starts a fresh fetch instead of
+            # joining one that is being cancelled.
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _finished(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not call.task.cancelled():
+            call.task.exception()
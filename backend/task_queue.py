@@ -0,0 +1,136 @@
+"""Bounded in-process queue for work that runs after the response is sent.
+
+Jobs are plain async callables. A fixed pool of worker tasks pulls them off
+an ``asyncio.Queue`` with a maximum size; when the queue is full ``submit``
+waits for space (backpressure on the producer) instead of buffering without
+limit. Failed jobs are retried with exponential backoff, and ``stop`` drains
+whatever is still queued before cancelling the workers.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+QUEUE_DEPTH = metrics.gauge(
+    "background_queue_depth",
+    "Jobs waiting in the background queue",
+)
+JOB_WAIT_SECONDS = metrics.histogram(
+    "background_job_wait_seconds",
+    "Time jobs spend queued before a worker picks them up",
+)
+JOB_RUN_SECONDS = metrics.histogram(
+    "background_job_run_seconds",
+    "Time spent running a job, including retries",
+)
+JOBS_TOTAL = metrics.counter(
+    "background_jobs_total",
+    "Background jobs by name and outcome",
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    args: Tuple[Any, ...] = ()
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class BackgroundTaskQueue:
+    def __init__(
+        self,
+        maxsize: int = 1000,
+        workers: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        enqueue_timeout: float = 5.0,
+    ):
+        self.maxsize = maxsize
+        self.worker_count = workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.enqueue_timeout = enqueue_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"background-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+
+    async def submit(self, name: str, func: Callable[..., Awaitable[Any]], *args, **kwargs):
+        """Queue ``func(*args, **kwargs)``, waiting for space when the queue is full.
+
+        If the queue is not running, or stays full for ``enqueue_timeout``
+        seconds, the job runs inline so it is never silently dropped.
+        """
+        job = Job(name, func, args, kwargs)
+        if self._queue is None:
+            await self._run(job)
+            return
+        try:
+            await asyncio.wait_for(self._queue.put(job), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            JOBS_TOTAL.inc(job=name, outcome="inline")
+            logger.warning("Background queue full, running %s inline", name)
+            await self._run(job)
+            return
+        QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            QUEUE_DEPTH.set(self._queue.qsize())
+            JOB_WAIT_SECONDS.observe(time.monotonic() - job.enqueued_at, job=job.name)
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            try:
+                await job.func(*job.args, **job.kwargs)
+                JOBS_TOTAL.inc(job=job.name, outcome="succeeded")
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                if attempt == self.max_retries:
+                    JOBS_TOTAL.inc(job=job.name, outcome="failed")
+                    logger.exception("Background job %s failed after %d attempts", job.name, attempt + 1)
+                    break
+                JOBS_TOTAL.inc(job=job.name, outcome="retried")
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+        JOB_RUN_SECONDS.observe(time.monotonic() - started, job=job.name)
+
+    async def stop(self, timeout: float = 10.0):
+        """Drain queued jobs (up to ``timeout`` seconds), then stop the workers"""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Background queue drain timed out with %d jobs left", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        QUEUE_DEPTH.set(0)
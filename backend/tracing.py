@@ -0,0 +1,186 @@
+"""Optional OpenTelemetry tracing.
+
+With ``TRACING_EXPORTER`` unset nothing is imported and every helper here is
+a no-op. With ``otlp`` or ``file`` the OpenTelemetry SDK (see
+``requirements-tracing.txt``) records a server span per request, continuing
+an incoming W3C ``traceparent``. Each Mongo command, S3 call, Razorpay call
+and outgoing Emergent request gets a child span. Sampling is decided once
+per trace at the root (``TRACING_SAMPLE_RATIO``). Child spans of unsampled
+requests are never created, and background work outside a request is not
+traced.
+"""
+import json
+import logging
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+from db_monitoring import command_filter, command_namespace, redact
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "thaparmart-backend"
+
+# Set by configure_tracing when tracing is enabled
+_tracer = None
+_provider = None
+_trace = None
+_propagate = None
+_span_file = None
+
+
+def configure_tracing(settings) -> bool:
+    """Set up the tracer provider and exporter; returns whether tracing is on"""
+    global _tracer, _provider, _trace, _propagate, _span_file
+    if not settings.tracing_exporter:
+        return False
+
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if settings.tracing_exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.tracing_otlp_endpoint)
+    else:
+        # One JSON span per line
+        _span_file = open(settings.tracing_file, "a", encoding="utf-8")
+        exporter = ConsoleSpanExporter(
+            out=_span_file,
+            formatter=lambda span: span.to_json(indent=None) + "\n",
+        )
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": SERVICE_NAME}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    _tracer = _provider.get_tracer(__name__)
+    _trace = trace
+    _propagate = propagate
+    logger.info(
+        "Tracing enabled (exporter=%s, sample_ratio=%s)",
+        settings.tracing_exporter, settings.tracing_sample_ratio
+    )
+    return True
+
+
+def shutdown_tracing():
+    """Flush buffered spans and stop the exporter"""
+    global _tracer, _provider, _span_file
+    if _provider is not None:
+        _provider.shutdown()
+    if _span_file is not None:
+        _span_file.close()
+    _tracer = _provider = _span_file = None
+
+
+def enabled() -> bool:
+    return _tracer is not None
+
+
+def _recording() -> bool:
+    return _tracer is not None and _trace.get_current_span().is_recording()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span for an outgoing call; a no-op unless the request is sampled"""
+    if not _recording():
+        yield None
+        return
+    with _tracer.start_as_current_span(name, kind=_trace.SpanKind.CLIENT, attributes=attributes) as current:
+        yield current
+
+
+def inject_headers(headers: dict) -> dict:
+    """Add traceparent (and tracestate) for the current span to outgoing headers"""
+    if _recording():
+        _propagate.inject(headers)
+    return headers
+
+
+class TracingMiddleware:
+    """ASGI middleware that wraps each HTTP request in a server span"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope.get("headers") or []
+        }
+        method = scope["method"]
+        with _tracer.start_as_current_span(
+            method,
+            context=_propagate.extract(carrier),
+            kind=_trace.SpanKind.SERVER,
+            attributes={"http.method": method, "http.target": scope["path"]},
+        ) as request_span:
+            async def send_with_status(message):
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        request_span.set_status(_trace.Status(_trace.StatusCode.ERROR))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    request_span.update_name(f"{method} {route}")
+                    request_span.set_attribute("http.route", route)
+
+
+class MongoTracingListener(monitoring.CommandListener):
+    """A client span per Mongo command issued while a sampled span is current.
+
+    Motor runs pymongo in executor threads with a copy of the caller's
+    context, so the current span here is the request (or call) that issued
+    the command.
+    """
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event):
+        if not _recording():
+            return
+        attributes = {
+            "db.system": "mongodb",
+            "db.name": event.database_name,
+            "db.operation": event.command_name,
+            "db.mongodb.namespace": command_namespace(event),
+        }
+        query = command_filter(event.command_name, event.command)
+        if query is not None:
+            attributes["db.statement"] = json.dumps(redact(query))
+        if isinstance(event.connection_id, tuple):
+            attributes["net.peer.name"], attributes["net.peer.port"] = event.connection_id
+        self._spans[(event.connection_id, event.request_id)] = _tracer.start_span(
+            f"mongo.{event.command_name}", kind=_trace.SpanKind.CLIENT, attributes=attributes
+        )
+
+    def succeeded(self, event):
+        current = self._spans.pop((event.connection_id, event.request_id), None)
+        if current is not None:
+            current.end()
+
+    def failed(self, event):
+        current = self._spans.pop((event.connection_id, event.request_id), None)
+        if current is not None:
+            current.set_status(_trace.Status(_trace.StatusCode.ERROR, str(event.failure.get("errmsg", ""))))
+            current.end()
+
+
+def configured_listeners() -> list:
+    """Command listeners to register on the Mongo client"""
+    return [MongoTracingListener()] if enabled() else []
@@ -83,9 +83,17 @@ deploy_production() {
     echo "🛑 Stopping existing containers..."
     docker-compose -f docker-compose.prod.yml down --remove-orphans || true
     
-    # Build and start services
+    # Keyfile and replica set (idempotent); after a full stop the backend
+    # starts again as the blue colour
+    echo "🗄️  Preparing the MongoDB replica set..."
+    mkdir -p nginx
+    echo "server backend-blue:8001;" > nginx/backend-upstream.conf
+    bash scripts/prod-bootstrap.sh
+    
+    # Build and start services. Later deploys can use scripts/auto-deploy.sh,
+    # which replaces the backend blue-green without stopping anything.
     echo "🔨 Building and starting production services..."
-    docker-compose -f docker-compose.prod.yml up --build -d
+    docker-compose -f docker-compose.prod.yml up --build -d backend-blue frontend
     
     echo "⏳ Waiting for services to start..."
     sleep 15
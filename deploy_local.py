@@ -114,6 +114,11 @@ services:
     image: mongo:latest
     container_name: thapar-mongodb-local
     restart: unless-stopped
+    healthcheck:
+      test: ["CMD", "mongosh", "--quiet", "--eval", "db.adminCommand('ping').ok"]
+      interval: 10s
+      timeout: 5s
+      retries: 5
     ports:
       - "27017:27017"
     environment:
@@ -132,6 +137,12 @@ services:
       dockerfile: Dockerfile
     container_name: thapar-backend-local
     restart: unless-stopped
+    healthcheck:
+      test: ["CMD", "python", "-c", "import urllib.request; urllib.request.urlopen('http://localhost:8001/api/readyz', timeout=3)"]
+      interval: 10s
+      timeout: 5s
+      retries: 3
+      start_period: 20s
     ports:
       - "8001:8001"
     environment:
@@ -150,7 +161,7 @@ services:
       - thapar-network-local
     volumes:
       - ./backend:/app
-    command: uvicorn server:app --host 0.0.0.0 --port 8001 --reload
+    command: uvicorn server:app --host 0.0.0.0 --port 8001 --reload --no-access-log
 
   # React Frontend
   frontend:
@@ -232,27 +243,40 @@ networks:
             print(f"❌ Error starting services: {e}")
             sys.exit(1)
             
-    def wait_for_services(self):
+    def probe_readiness(self):
+        """Ask the backend container for /api/readyz; returns the HTTP status or None"""
+        probe = (
+            "import urllib.request, urllib.error\n"
+            "try:\n"
+            "    print(urllib.request.urlopen('http://localhost:8001/api/readyz', timeout=3).status)\n"
+            "except urllib.error.HTTPError as e:\n"
+            "    print(e.code)\n"
+        )
+        try:
+            result = subprocess.run(['docker-compose', 'exec', '-T', 'backend', 'python', '-c', probe],
+                                  cwd=self.project_root, capture_output=True, text=True, timeout=15)
+            return int(result.stdout.strip()) if result.returncode == 0 else None
+        except (subprocess.TimeoutExpired, ValueError):
+            return None
+            
+    def wait_for_services(self, timeout=120):
         print("\n⏳ Waiting for services to be ready...")
         
-        for i in range(30):
-            try:
-                # Check if services are running
-                result = subprocess.run(['docker-compose', 'ps'], 
-                                      cwd=self.project_root, capture_output=True, text=True)
-                
-                if "Up" in result.stdout:
-                    time.sleep(2)  # Wait a bit more for full startup
-                    print("✅ Services are ready!")
-                    return True
-                    
-                time.sleep(2)
-                print(f"   Waiting... ({i+1}/30)")
-                
-            except Exception:
-                time.sleep(2)
+        # Poll the readiness endpoint (Mongo ping included) with exponential backoff
+        deadline = time.time() + timeout
+        delay = 1.0
+        attempt = 0
+        while time.time() < deadline:
+            attempt += 1
+            status = self.probe_readiness()
+            if status == 200:
+                print("✅ Services are ready!")
+                return True
+            print(f"   Not ready yet (attempt {attempt}, {status or 'no response'}), retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            delay = min(delay * 1.5, 10.0)
                 
-        print("⚠️  Services may still be starting up...")
+        print("⚠️  Services did not report ready in time. Check: docker-compose logs backend")
         return False
         
     def show_service_status(self):
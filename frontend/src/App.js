@@ -6,6 +6,8 @@ import { useRazorpay } from "react-razorpay";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+// Listings per storefront page; later pages follow next_cursor
+const STOREFRONT_PAGE_SIZE = 50;
 
 // Auth Context
 const AuthContext = createContext();
@@ -622,6 +624,31 @@ const Marketplace = () => {
     fetchProducts();
   }, [selectedCategory]);
 
+  // Apply live product deltas instead of re-downloading the whole list
+  useEffect(() => {
+    const query = selectedCategory ? `?category=${selectedCategory}` : '';
+    const source = new EventSource(`${API}/products/stream${query}`);
+
+    const removeProduct = (event) => {
+      const { id } = JSON.parse(event.data);
+      setProducts(current => current.filter(product => product.id !== id));
+    };
+
+    source.addEventListener('created', async (event) => {
+      const { id } = JSON.parse(event.data);
+      try {
+        const response = await axios.get(`${API}/products/${id}`);
+        setProducts(current => [response.data, ...current.filter(product => product.id !== id)]);
+      } catch (error) {
+        console.error('Error fetching new product:', error);
+      }
+    });
+    source.addEventListener('sold', removeProduct);
+    source.addEventListener('deleted', removeProduct);
+
+    return () => source.close();
+  }, [selectedCategory]);
+
   const handleBuyClick = (product) => {
     if (!user) {
       alert("Please login to buy products!");
@@ -694,8 +721,8 @@ const Marketplace = () => {
         <SellProductModal 
           onClose={() => setShowSellForm(false)}
           onSuccess={() => {
+            // The new listing arrives through the product stream
             setShowSellForm(false);
-            fetchProducts();
           }}
         />
       )}
@@ -1219,6 +1246,8 @@ const Profile = () => {
   const userId = pathname.split('/')[2]; // Extract userId from path like /profile/123
   const [profileUser, setProfileUser] = useState(null);
   const [userProducts, setUserProducts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [isEditing, setIsEditing] = useState(false);
   const [formData, setFormData] = useState({
     phone: '',
@@ -1231,8 +1260,7 @@ const Profile = () => {
 
   useEffect(() => {
     if (targetUserId) {
-      fetchUserProfile();
-      fetchUserProducts();
+      fetchStorefront();
     }
   }, [targetUserId]);
 
@@ -1249,25 +1277,32 @@ const Profile = () => {
     }
   }, [user, isOwnProfile]);
 
-  const fetchUserProfile = async () => {
+  const fetchStorefront = async () => {
     try {
-      if (isOwnProfile && user) {
-        setProfileUser(user);
-      } else {
-        const response = await axios.get(`${API}/users/${targetUserId}`);
-        setProfileUser(response.data);
-      }
+      // Profile, listings and counts come back in a single request
+      const response = await axios.get(`${API}/users/${targetUserId}/storefront`, {
+        params: { limit: STOREFRONT_PAGE_SIZE, include_archived: true }
+      });
+      setProfileUser(isOwnProfile && user ? user : response.data.user);
+      setUserProducts(response.data.products);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
-      console.error('Error fetching user profile:', error);
+      console.error('Error fetching user storefront:', error);
     }
   };
 
-  const fetchUserProducts = async () => {
+  const loadMoreProducts = async () => {
+    setLoadingMore(true);
     try {
-      const response = await axios.get(`${API}/products/user/${targetUserId}`);
-      setUserProducts(response.data);
+      const response = await axios.get(`${API}/users/${targetUserId}/storefront`, {
+        params: { limit: STOREFRONT_PAGE_SIZE, include_archived: true, cursor: nextCursor }
+      });
+      setUserProducts(products => [...products, ...response.data.products]);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
-      console.error('Error fetching user products:', error);
+      console.error('Error fetching more products:', error);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -1362,11 +1397,24 @@ const Profile = () => {
           </h2>
           
           {userProducts.length > 0 ? (
-            <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-6">
-              {userProducts.map(product => (
-                <ProductCard key={product.id} product={product} onBuy={() => {}} />
-              ))}
-            </div>
+            <>
+              <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-6">
+                {userProducts.map(product => (
+                  <ProductCard key={product.id} product={product} onBuy={() => {}} />
+                ))}
+              </div>
+              {nextCursor && (
+                <div className="text-center mt-8">
+                  <button
+                    onClick={loadMoreProducts}
+                    disabled={loadingMore}
+                    className="bg-black text-white px-6 py-2 rounded-lg hover:bg-gray-800 transition-colors disabled:bg-gray-400"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                </div>
+              )}
+            </>
           ) : (
             <div className="text-center py-12">
               <p className="text-gray-600 text-xl">
@@ -5,10 +5,22 @@
 
 set -e
 
-PROJECT_DIR="/path/to/your/thapar-marketplace"
-BACKUP_DIR="/path/to/backups"
+PROJECT_DIR="${PROJECT_DIR:-/path/to/your/thapar-marketplace}"
+BACKUP_DIR="${BACKUP_DIR:-/path/to/backups}"
+BACKUP_KEEP=7
 LOG_FILE="/var/log/thapar-autodeploy.log"
 
+# Blue-green backend: nginx/backend-upstream.conf names the live colour
+COMPOSE="docker-compose -f docker-compose.prod.yml"
+UPSTREAM_CONF="nginx/backend-upstream.conf"
+FRONTEND_CONTAINER="thapar-frontend-prod"
+FRONTEND_IMAGE="thapar-frontend-prod:latest"
+# auto: restart nginx when the frontend image changed; skip: leave it running
+FRONTEND_UPDATE="${FRONTEND_UPDATE:-auto}"
+READY_TIMEOUT=180
+# Time for nginx's old workers to finish requests to the old colour after a reload
+DRAIN_SECONDS=10
+
 # Logging function
 log() {
     echo "$(date '+%Y-%m-%d %H:%M:%S') - $1" | tee -a "$LOG_FILE"
@@ -21,11 +33,146 @@ create_backup() {
     # Create backup directory if it doesn't exist
     mkdir -p "$BACKUP_DIR"
     
-    # Backup MongoDB data
-    docker exec thapar-mongodb-prod mongodump --out /backup
-    docker cp thapar-mongodb-prod:/backup "$BACKUP_DIR/mongo-$(date +%Y%m%d-%H%M%S)"
+    # Stream a compressed archive straight to the host; write to .partial and
+    # rename only once mongodump has succeeded
+    local archive="$BACKUP_DIR/mongo-$(date +%Y%m%d-%H%M%S).archive.gz"
+    if ! docker exec thapar-mongodb-prod sh -c \
+        'mongodump -u "$MONGO_INITDB_ROOT_USERNAME" -p "$MONGO_INITDB_ROOT_PASSWORD" --authenticationDatabase admin --db=thaparMARTN --archive --gzip --numParallelCollections=4' \
+        > "$archive.partial"; then
+        rm -f "$archive.partial"
+        log "❌ Backup failed"
+        return 1
+    fi
+    mv "$archive.partial" "$archive"
+    
+    # Keep the newest $BACKUP_KEEP archives
+    ls -1t "$BACKUP_DIR"/mongo-*.archive.gz 2>/dev/null | tail -n +$((BACKUP_KEEP + 1)) | xargs -r rm -f
+    
+    log "Backup created successfully: $archive"
+}
+
+backend_container() {
+    echo "thapar-backend-prod-$1"
+}
+
+live_colour() {
+    sed -n 's/^server backend-\(blue\|green\):8001;$/\1/p' "$UPSTREAM_CONF" 2>/dev/null
+}
+
+# Poll /api/readyz inside a backend container until it answers 200
+wait_until_ready() {
+    local container="$1"
+    local deadline=$((SECONDS + READY_TIMEOUT))
+    while [ $SECONDS -lt $deadline ]; do
+        if docker exec "$container" python -c \
+            "import urllib.request; urllib.request.urlopen('http://localhost:8001/api/readyz', timeout=3)" \
+            > /dev/null 2>&1; then
+            return 0
+        fi
+        sleep 2
+    done
+    return 1
+}
+
+# Point nginx at a colour. The file is rewritten in place because the frontend
+# container bind-mounts it; the reload is graceful, so requests already in
+# flight finish on the old workers.
+switch_upstream() {
+    echo "server backend-$1:8001;" > "$UPSTREAM_CONF"
+    docker exec "$FRONTEND_CONTAINER" nginx -t -q && docker exec "$FRONTEND_CONTAINER" nginx -s reload
+}
+
+# End to end: nginx -> live backend -> Mongo (a just-started nginx gets a few tries)
+check_through_proxy() {
+    local attempt
+    for attempt in 1 2 3 4 5; do
+        docker exec "$FRONTEND_CONTAINER" wget -q -O /dev/null http://127.0.0.1/api/readyz 2>/dev/null && return 0
+        sleep 2
+    done
+    return 1
+}
+
+# No live colour yet (new server, or the single-backend layout): start blue.
+# Migrating from the old layout replaces its backend container, so this one
+# deploy is not zero-downtime.
+first_deploy() {
+    log "No live backend colour; starting backend-blue..."
+    mkdir -p "$(dirname "$UPSTREAM_CONF")"
+    echo "server backend-blue:8001;" > "$UPSTREAM_CONF"
+    $COMPOSE build backend-blue frontend || return 1
+    $COMPOSE up -d --remove-orphans backend-blue frontend || return 1
     
-    log "Backup created successfully"
+    if ! wait_until_ready "$(backend_container blue)"; then
+        log "❌ backend-blue did not become ready"
+        docker logs --tail 50 "$(backend_container blue)" 2>&1 | tee -a "$LOG_FILE"
+        return 1
+    fi
+}
+
+# Start the idle colour next to the live one, switch nginx once it is ready,
+# then drain and stop the old colour. Any failure before the old colour is
+# stopped puts traffic back on it.
+rolling_deploy() {
+    local live="$1"
+    local idle=blue
+    [ "$live" = blue ] && idle=green
+    
+    # Build ahead of time; the live colour keeps serving meanwhile
+    log "Building images (backend-$live stays live)..."
+    $COMPOSE build backend-$idle frontend || return 1
+    
+    log "Starting backend-$idle next to backend-$live..."
+    if ! $COMPOSE up -d --no-deps --force-recreate backend-$idle || ! wait_until_ready "$(backend_container $idle)"; then
+        log "❌ backend-$idle did not become ready; rolling back"
+        docker logs --tail 50 "$(backend_container $idle)" 2>&1 | tee -a "$LOG_FILE"
+        $COMPOSE stop backend-$idle
+        return 1
+    fi
+    
+    log "Switching nginx to backend-$idle..."
+    if ! switch_upstream "$idle" || ! check_through_proxy; then
+        log "❌ Health check through nginx failed; rolling back to backend-$live"
+        switch_upstream "$live"
+        $COMPOSE stop backend-$idle
+        return 1
+    fi
+    
+    # SIGTERM makes uvicorn finish in-flight requests, then the lifespan drains
+    # queued background jobs (readyz reports "draining"); stop_grace_period
+    # bounds both
+    log "Draining backend-$live..."
+    sleep "$DRAIN_SECONDS"
+    $COMPOSE stop backend-$live
+    
+    log "backend-$idle is live"
+}
+
+# The frontend container is the only nginx and holds ports 80/443, so
+# recreating it drops every open connection for a few seconds. That is not
+# part of the zero-downtime backend switch: it only happens when the frontend
+# image changed, and a new frontend that fails its check is replaced by the
+# previous image again.
+update_frontend() {
+    local running_image
+    running_image=$(docker inspect -f '{{.Image}}' "$FRONTEND_CONTAINER" 2>/dev/null)
+    if [ "$running_image" = "$(docker image inspect -f '{{.Id}}' "$FRONTEND_IMAGE")" ]; then
+        log "Frontend unchanged; nginx keeps running"
+        return 0
+    fi
+    if [ "$FRONTEND_UPDATE" = skip ]; then
+        log "⚠️  Frontend image changed but FRONTEND_UPDATE=skip; nginx keeps the old frontend"
+        return 0
+    fi
+    
+    log "⚠️  Frontend image changed; restarting nginx (open connections drop for a few seconds)"
+    if $COMPOSE up -d --no-deps frontend && check_through_proxy; then
+        return 0
+    fi
+    log "❌ New frontend failed its health check; restoring the previous image"
+    docker tag "$running_image" "$FRONTEND_IMAGE"
+    $COMPOSE up -d --no-deps --force-recreate frontend
+    check_through_proxy
+    return 1
 }
 
 # Function to deploy
@@ -41,39 +188,34 @@ deploy() {
     # Create backup before deployment
     create_backup
     
+    # Keyfile, replica set and upstream file; no-ops once they exist
+    log "Checking production prerequisites..."
+    bash scripts/prod-bootstrap.sh 2>&1 | tee -a "$LOG_FILE"
+    [ "${PIPESTATUS[0]}" -eq 0 ] || return 1
+    
     # Deploy production
     log "Deploying production services..."
-    docker-compose -f docker-compose.prod.yml down
-    docker-compose -f docker-compose.prod.yml up --build -d
-    
-    # Wait for services to be ready
-    log "Waiting for services to start..."
-    sleep 30
-    
-    # Health check
-    if docker-compose -f docker-compose.prod.yml ps | grep -q "Up"; then
-        log "✅ Auto-deployment completed successfully!"
-        
-        # Send notification (optional)
-        # curl -X POST "https://your-webhook-url.com/notify" \
-        #      -H "Content-Type: application/json" \
-        #      -d '{"message": "Thapar Marketplace deployed successfully"}'
-        
+    local live
+    live=$(live_colour)
+    if [ -n "$live" ] && [ "$(docker inspect -f '{{.State.Running}}' "$(backend_container "$live")" 2>/dev/null)" = "true" ]; then
+        rolling_deploy "$live" || return 1
+        update_frontend || return 1
     else
-        log "❌ Deployment failed! Rolling back..."
-        
-        # Rollback logic (optional)
-        # docker-compose -f docker-compose.prod.yml down
-        # docker-compose -f docker-compose.prod.yml up -d
-        
-        exit 1
+        first_deploy || return 1
     fi
+    
+    log "✅ Auto-deployment completed successfully!"
+    
+    # Send notification (optional)
+    # curl -X POST "https://your-webhook-url.com/notify" \
+    #      -H "Content-Type: application/json" \
+    #      -d '{"message": "Thapar Marketplace deployed successfully"}'
 }
 
 # Main execution
 main() {
     log "Auto-deployment triggered"
-    deploy
+    deploy || return 1
     log "Auto-deployment process completed"
 }
 
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark the nginx /api/ proxy (frontend/nginx.conf) against a stub upstream.
+Run with: python scripts/bench_nginx_cache.py [--requests 2000] [--concurrency 20]
+
+Starts a stub backend that answers every request after a fixed delay, runs
+nginx in Docker with the real config pointed at the stub, then sends the same
+GET /api/products request anonymously (microcached) and with a session cookie
+(cache bypassed). For each run it reports throughput, latency percentiles,
+how many requests reached the upstream and how many upstream connections
+nginx opened (keep-alive reuse).
+"""
+
+import argparse
+import http.client
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+NGINX_CONF = Path(__file__).resolve().parent.parent / "frontend" / "nginx.conf"
+CONTAINER_NAME = "thapar-nginx-bench"
+BENCH_PATH = "/api/products?category=Electronics&limit=20"
+
+
+class StubUpstream(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port, delay):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.delay = delay
+        self.body = json.dumps([{"id": str(index), "title": f"Item {index}", "price": 100 + index} for index in range(20)]).encode()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.connections = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; don't let Nagle delay the body
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.server.body)))
+        self.end_headers()
+        self.wfile.write(self.server.body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def bench_config(nginx_port, upstream_port):
+    """The shipped config, pointed at the stub and without the SPA/static bits that need files"""
+    conf = NGINX_CONF.read_text()
+    conf = conf.replace("include /etc/nginx/backend-upstream.conf;", f"server 127.0.0.1:{upstream_port};")
+    conf = conf.replace("listen       80;", f"listen       {nginx_port};")
+    conf = conf.replace("listen  [::]:80;", "")
+    return conf
+
+
+def start_nginx(conf_path, image):
+    subprocess.run(["docker", "rm", "-f", CONTAINER_NAME], capture_output=True)
+    subprocess.run([
+        "docker", "run", "-d", "--name", CONTAINER_NAME, "--network", "host",
+        "-v", f"{conf_path}:/etc/nginx/nginx.conf:ro", image
+    ], check=True, capture_output=True)
+
+
+def wait_for(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/api/healthz")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    sys.exit(f"nginx did not start on port {port}; check: docker logs {CONTAINER_NAME}")
+
+
+def run_load(port, total, concurrency, headers):
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+    per_worker = total // concurrency
+
+    def worker():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        local_latencies, local_statuses = [], Counter()
+        for _ in range(per_worker):
+            started = time.perf_counter()
+            connection.request("GET", BENCH_PATH, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            local_latencies.append(time.perf_counter() - started)
+            local_statuses[response.getheader("X-Cache-Status") or "-"] += 1
+        connection.close()
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, sorted(latencies), statuses
+
+
+def report(label, elapsed, latencies, statuses, upstream):
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"\n{label}")
+    print(f"  {len(latencies) / elapsed:8.0f} req/s   p50 {statistics.median(latencies) * 1000:6.1f} ms   p99 {p99 * 1000:6.1f} ms")
+    print(f"  upstream: {upstream.requests} requests over {upstream.connections} connections")
+    print(f"  cache:    {dict(statuses)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark nginx microcaching and upstream keep-alive")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--upstream-delay-ms", type=float, default=20, help="Simulated backend latency")
+    parser.add_argument("--nginx-port", type=int, default=18080)
+    parser.add_argument("--upstream-port", type=int, default=18001)
+    parser.add_argument("--image", default="nginx:alpine")
+    args = parser.parse_args()
+
+    upstream = StubUpstream(args.upstream_port, args.upstream_delay_ms / 1000)
+    threading.Thread(target=upstream.serve_forever, daemon=True).start()
+
+    with tempfile.NamedTemporaryFile("w", suffix=".conf", delete=False) as conf_file:
+        conf_file.write(bench_config(args.nginx_port, args.upstream_port))
+    try:
+        start_nginx(conf_file.name, args.image)
+        wait_for(args.nginx_port)
+
+        scenarios = [
+            ("Anonymous (microcached)", {}),
+            ("Session cookie (cache bypassed, keep-alive only)", {"Cookie": "session_token=bench"}),
+        ]
+        for label, headers in scenarios:
+            upstream.reset()
+            elapsed, latencies, statuses = run_load(args.nginx_port, args.requests, args.concurrency, headers)
+            report(label, elapsed, latencies, statuses, upstream)
+    finally:
+        subprocess.run(["docker", "rm", "-f", CONTAINER_NAME], capture_output=True)
+        Path(conf_file.name).unlink(missing_ok=True)
+        upstream.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/bin/bash
+
+# One-time (and idempotent) production prerequisites shared by every deploy path:
+#   - ./mongo-keyfile, the secret replica set members authenticate with
+#   - the rs0 replica set, initiated and with an elected primary
+#   - nginx/backend-upstream.conf, which the frontend container bind-mounts
+# Safe to run before every deploy; steps that are already done are skipped.
+# Needs MONGO_PASSWORD etc. in the environment, as docker-compose.prod.yml does.
+
+set -e
+
+cd "$(dirname "$0")/.."
+
+COMPOSE="docker-compose -f docker-compose.prod.yml"
+KEYFILE="mongo-keyfile"
+UPSTREAM_CONF="nginx/backend-upstream.conf"
+REPLICA_SET_NAME="rs0"
+MONGO_NODES="mongodb mongodb-2 mongodb-3"
+PRIMARY_TIMEOUT=120
+
+# A bind mount of a missing file makes Docker create a directory in its place
+remove_docker_placeholder() {
+    if [ -d "$1" ]; then
+        rmdir "$1" 2>/dev/null || { echo "❌ $1 is a non-empty directory; remove it first"; exit 1; }
+    fi
+}
+
+ensure_keyfile() {
+    remove_docker_placeholder "$KEYFILE"
+    if [ ! -s "$KEYFILE" ]; then
+        # mongod accepts 6-1024 base64 characters
+        openssl rand -base64 756 | tr -d '\n' > "$KEYFILE"
+        chmod 600 "$KEYFILE"
+        echo "✅ Created $KEYFILE"
+    fi
+}
+
+ensure_upstream_conf() {
+    remove_docker_placeholder "$UPSTREAM_CONF"
+    if [ ! -s "$UPSTREAM_CONF" ]; then
+        mkdir -p "$(dirname "$UPSTREAM_CONF")"
+        echo "server backend-blue:8001;" > "$UPSTREAM_CONF"
+        echo "✅ Created $UPSTREAM_CONF (backend-blue)"
+    fi
+}
+
+# Run a mongosh script as the root user on the first node
+mongo_eval() {
+    $COMPOSE exec -T -e MONGO_SCRIPT="$1" mongodb sh -c \
+        'mongosh --quiet -u "$MONGO_INITDB_ROOT_USERNAME" -p "$MONGO_INITDB_ROOT_PASSWORD" --authenticationDatabase admin --eval "$MONGO_SCRIPT"'
+}
+
+ensure_replica_set() {
+    $COMPOSE up -d $MONGO_NODES
+
+    # The first node gets a higher priority so it is primary whenever it is healthy
+    local members="" index=0 node
+    for node in $MONGO_NODES; do
+        [ -n "$members" ] && members="$members, "
+        members="$members{_id: $index, host: '$node:27017', priority: $([ $index -eq 0 ] && echo 2 || echo 1)}"
+        index=$((index + 1))
+    done
+    local initiate="try { rs.status(); print('initialized'); } catch (e) { if (e.codeName !== 'NotYetInitialized') throw e; rs.initiate({_id: '$REPLICA_SET_NAME', members: [$members]}); print('initiated'); }"
+
+    # Retry until mongod accepts connections, then until a primary is elected
+    local deadline=$((SECONDS + PRIMARY_TIMEOUT))
+    local initiated=false
+    while [ $SECONDS -lt $deadline ]; do
+        if [ "$initiated" = false ] && mongo_eval "$initiate" > /dev/null 2>&1; then
+            initiated=true
+        fi
+        if [ "$initiated" = true ] && [ "$(mongo_eval 'db.hello().isWritablePrimary' 2>/dev/null | tr -d '\r')" = "true" ]; then
+            echo "✅ Replica set $REPLICA_SET_NAME has a primary"
+            return 0
+        fi
+        sleep 3
+    done
+    echo "❌ Replica set did not elect a primary in time. Check: $COMPOSE logs mongodb"
+    exit 1
+}
+
+ensure_keyfile
+ensure_upstream_conf
+ensure_replica_set
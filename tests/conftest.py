@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The API modules are top-level modules in backend/ (that is how the image runs them)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+PLAN_SUMMARIES = []
+
+
+@pytest.fixture(scope="session")
+def plan_summaries():
+    """Per-query plan summaries, printed at the end of the run"""
+    return PLAN_SUMMARIES
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not PLAN_SUMMARIES:
+        return
+    terminalreporter.section("query plans")
+    terminalreporter.write_line(
+        f"{'query':<34} {'index':<28} {'stages':<34} {'keys':>6} {'docs':>6} {'ret':>5} {'ms':>4}"
+    )
+    for summary in PLAN_SUMMARIES:
+        terminalreporter.write_line(
+            f"{summary['query']:<34} {summary['index'] or '-':<28} {summary['stages']:<34} "
+            f"{summary['keys_examined']:>6} {summary['docs_examined']:>6} {summary['returned']:>5} {summary['ms']:>4}"
+        )
@@ -0,0 +1,168 @@
+"""Query-plan regression tests for the API's hot queries.
+
+Each test explains one query shape from ``queries.py`` with
+``executionStats`` against a scratch database that is seeded with
+``seed.py``'s generators and indexed with ``indexes.py``. A test fails when
+the winning plan scans the collection, sorts in memory, or examines more
+than QUERY_PLAN_MAX_RATIO documents per document returned.
+
+Needs a mongod at TEST_MONGO_URL (default mongodb://localhost:27017); the
+tests are skipped when none is reachable.
+"""
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pymongo = pytest.importorskip("pymongo")
+
+import indexes  # noqa: E402
+import queries  # noqa: E402
+import seed  # noqa: E402
+from product_feed import FEED_COLLECTION, feed_document  # noqa: E402
+
+MONGO_URL = os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017")
+MAX_RATIO = float(os.environ.get("QUERY_PLAN_MAX_RATIO", "3"))
+SEED = 1234
+USERS, PRODUCTS, SESSIONS, PAYMENT_TOKENS = 300, 6000, 1000, 2000
+PAGE = 20
+
+
+@pytest.fixture(scope="module")
+def seeded():
+    client = pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError as e:
+        client.close()
+        pytest.skip(f"No mongod at {MONGO_URL}: {e}")
+
+    db = client[f"query_plans_{uuid.uuid4().hex[:8]}"]
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    try:
+        for collection, models in indexes.INDEXES.items():
+            db[collection].create_indexes(models)
+
+        users = [seed.make_user(SEED, index, now) for index in range(USERS)]
+        products = [seed.make_product(SEED, index, USERS, now) for index in range(PRODUCTS)]
+        sessions = [seed.make_session(SEED, index, USERS, now) for index in range(SESSIONS)]
+        tokens = [seed.make_payment_token(SEED, index, USERS, now) for index in range(PAYMENT_TOKENS)]
+        # A buyer with a few paid, unexpired upload tokens
+        buyer = users[1]
+        for index in range(5):
+            token = seed.make_payment_token(SEED, PAYMENT_TOKENS + index, USERS, now)
+            tokens.append({**token, "user_id": buyer["id"], "status": "paid", "expires_at": now + timedelta(minutes=10 + index)})
+
+        db.users.insert_many(users)
+        db.products.insert_many(products)
+        db[FEED_COLLECTION].insert_many([feed_document(product) for product in products if not product["is_sold"]])
+        db.sessions.insert_many(sessions)
+        db.payment_tokens.insert_many(tokens)
+
+        live_session = next(session for session in sessions if session["expires_at"] > now)
+        top_seller = max(
+            db.products.aggregate([{"$group": {"_id": "$seller_id", "count": {"$sum": 1}}}]),
+            key=lambda group: group["count"]
+        )["_id"]
+        yield {
+            "db": db,
+            "now": now,
+            "session_token": live_session["session_token"],
+            "seller_id": top_seller,
+            "buyer_id": buyer["id"],
+        }
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+
+def page_cursor(db, sort, category=None):
+    """Keyset position after the first page, as decode_product_cursor returns it"""
+    query, sort_spec = queries.product_listing(category=category, sort=sort)
+    last = list(db[FEED_COLLECTION].find(query).sort(sort_spec).limit(PAGE))[-1]
+    sort_field, _ = queries.PRODUCT_SORTS[sort]
+    return last[sort_field], last["id"]
+
+
+# name -> builder(seeded) returning (collection, filter, sort, limit)
+HOT_QUERIES = {
+    "get_current_user session": lambda s: (
+        "sessions", queries.session_filter(s["session_token"], s["now"]), None, 1),
+    "get_products newest": lambda s: (
+        FEED_COLLECTION, *queries.product_listing(), PAGE),
+    "get_products category newest": lambda s: (
+        FEED_COLLECTION, *queries.product_listing(category="Electronics"), PAGE),
+    "get_products price range newest": lambda s: (
+        FEED_COLLECTION, *queries.product_listing(min_price=100, max_price=1000), PAGE),
+    "get_products price_asc": lambda s: (
+        FEED_COLLECTION, *queries.product_listing(sort="price_asc"), PAGE),
+    "get_products category price_desc": lambda s: (
+        FEED_COLLECTION, *queries.product_listing(category="Notes", sort="price_desc"), PAGE),
+    "get_products newest page 2": lambda s: (
+        FEED_COLLECTION, *queries.product_listing(last_position=page_cursor(s["db"], "newest")), PAGE),
+    "get_products category price page 2": lambda s: (
+        FEED_COLLECTION,
+        *queries.product_listing(
+            category="Clothes", sort="price_asc", last_position=page_cursor(s["db"], "price_asc", "Clothes")
+        ),
+        PAGE),
+    "get_user_products": lambda s: (
+        "products", {"seller_id": s["seller_id"]}, queries.SELLER_PRODUCTS_SORT, 0),
+    "check_valid_upload_token": lambda s: (
+        "payment_tokens", queries.paid_tokens_filter(s["buyer_id"], s["now"]), None, 1),
+    "get_user_payment_tokens": lambda s: (
+        "payment_tokens", queries.paid_tokens_filter(s["buyer_id"], s["now"]), [("expires_at", -1)], 0),
+    "bulk_import_products tokens": lambda s: (
+        "payment_tokens", queries.paid_tokens_filter(s["buyer_id"], s["now"]), [("expires_at", 1)], 100),
+}
+
+
+def explain(db, collection, query, sort, limit):
+    command = {"find": collection, "filter": query}
+    if sort:
+        command["sort"] = dict(sort)
+    if limit:
+        command["limit"] = limit
+    return db.command("explain", command, verbosity="executionStats")
+
+
+def plan_nodes(node):
+    """Every plan stage in a (possibly nested) winning plan"""
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node
+        for value in node.values():
+            yield from plan_nodes(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_nodes(item)
+
+
+@pytest.mark.parametrize("name", list(HOT_QUERIES))
+def test_hot_query_is_index_backed(seeded, plan_summaries, name):
+    collection, query, sort, limit = HOT_QUERIES[name](seeded)
+    explanation = explain(seeded["db"], collection, query, sort, limit)
+
+    nodes = list(plan_nodes(explanation["queryPlanner"]["winningPlan"]))
+    stages = [node["stage"] for node in nodes]
+    index_names = sorted({node["indexName"] for node in nodes if node.get("indexName")})
+    stats = explanation["executionStats"]
+    returned, docs_examined = stats["nReturned"], stats["totalDocsExamined"]
+    plan_summaries.append({
+        "query": name,
+        "index": ",".join(index_names),
+        "stages": ">".join(stages),
+        "keys_examined": stats["totalKeysExamined"],
+        "docs_examined": docs_examined,
+        "returned": returned,
+        "ms": stats["executionTimeMillis"],
+    })
+
+    assert "COLLSCAN" not in stages, f"{name} scans {collection}: {stages}"
+    assert "SORT" not in stages, f"{name} sorts in memory: {stages}"
+    ratio = docs_examined / max(returned, 1)
+    assert ratio <= MAX_RATIO, (
+        f"{name} examined {docs_examined} documents to return {returned} "
+        f"(ratio {ratio:.1f} > {MAX_RATIO})"
+    )
@@ -0,0 +1,85 @@
+"""SingleFlight coalescing and cancellation behaviour."""
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_fetch():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+        return results, calls, flight.in_flight
+
+    results, calls, in_flight = asyncio.run(scenario())
+    assert results == [1] * 5
+    assert calls == 1
+    assert in_flight == 0
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        return await asyncio.gather(*(flight.do("k", fetch) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+def test_cancelled_waiter_does_not_cancel_shared_fetch():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.create_task(flight.do("k", fetch))
+        second = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first
+
+    result, first = asyncio.run(scenario())
+    assert result == "ok"
+    assert first.cancelled()
+
+
+def test_caller_after_last_waiter_cancels_starts_fresh_fetch():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = 0
+
+        async def fetch():
+            nonlocal started
+            started += 1
+            await asyncio.sleep(0.05)
+            return started
+
+        leader = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        # Let the leader's cancellation run, but not the fetch task's unwinding
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        result = await flight.do("k", fetch)
+        return result, started, flight.in_flight
+
+    result, started, in_flight = asyncio.run(scenario())
+    assert result == 2
+    assert started == 2
+    assert in_flight == 0